@@ -3,6 +3,7 @@ from flask import Flask
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
 import logging
 from logging.handlers import RotatingFileHandler
 from flask_login import LoginManager
@@ -14,7 +15,28 @@ login.login_view = 'main.login'
 
 from dotenv import load_dotenv
 
-def create_app():
+def _engine_options(config):
+    """Builds the SQLAlchemy engine options from the DB_POOL_* and SQLITE_* settings."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        options = {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT']}}
+        # In-memory databases use a single static connection
+        if uri in ('sqlite://', 'sqlite:///:memory:'):
+            return options
+    else:
+        options = {'pool_pre_ping': config['DB_POOL_PRE_PING'], 'pool_recycle': config['DB_POOL_RECYCLE']}
+    options.update(pool_size=config['DB_POOL_SIZE'], max_overflow=config['DB_MAX_OVERFLOW'],
+                   pool_timeout=config['DB_POOL_TIMEOUT'])
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    # Safe with WAL: a power loss can only lose the last transactions, not corrupt the file
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+def create_app(config_overrides=None):
     app = Flask(__name__, instance_relative_config=True)
 
     # Ensure the instance folder exists. This is critical for SQLite database creation.
@@ -54,19 +76,46 @@ def create_app():
             # This ensures a consistent, reliable path for local development.
             app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(app.instance_path, 'app.db')
 
+    # Used by scripts (e.g. the benchmarks) to point the app at their own database
+    if config_overrides:
+        app.config.update(config_overrides)
+
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in app.config:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app.config)
     db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite' and app.config['SQLITE_WAL']:
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
     migrate.init_app(app, db, render_as_batch=True)
     login.init_app(app)
 
     from app.routes import bp as main_bp
     app.register_blueprint(main_bp)
 
+    from app.metrics import metrics
+    metrics.init_app(app)
+
+    from app.cache import research_cache
+    research_cache.init_app(app)
+
+    from app.caching import fragment_cache
+    fragment_cache.init_app(app)
+
+    from app.search import search_index
+    search_index.init_app(app)
+
+    from app.ratelimit import rate_limiter
+    rate_limiter.init_app(app)
+
+    from app.worker import research_executor
+    research_executor.init_app(app)
+
     from app import models
 
     if not app.debug and not app.testing:
         if not os.path.exists('logs'):
             os.mkdir('logs')
-        file_handler = RotatingFileHandler('logs/talia.log', maxBytes=10240,
+        file_handler = RotatingFileHandler('logs/talia.log', maxBytes=app.config['LOG_FILE_MAX_BYTES'],
                                            backupCount=10)
         file_handler.setFormatter(logging.Formatter(
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
@@ -0,0 +1,143 @@
+import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from flask import current_app
+from sqlalchemy import select, delete, func
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import ResearchCacheEntry
+
+
+def normalize_linkedin_url(linkedin_url):
+    """Reduces a profile URL to a canonical form so trivial variants share a cache entry."""
+    parsed = urlparse(linkedin_url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return f"{host}{parsed.path.rstrip('/')}".lower()
+
+
+def research_cache_key(linkedin_url, project_prompt, research_model):
+    """Returns the content address of a research result."""
+    content = '\x1f'.join([normalize_linkedin_url(linkedin_url), project_prompt.strip(), research_model])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class MemoryCacheBackend:
+    """An in-process LRU cache. Each gunicorn worker keeps its own copy."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, data = entry
+                if expires_at < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = data
+        return found
+
+    def set(self, key, data):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DatabaseCacheBackend:
+    """A cache stored in the `research_cache_entry` table, shared by all processes."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get_many(self, keys):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        rows = db.session.execute(
+            select(ResearchCacheEntry.key, ResearchCacheEntry.payload)
+            .where(ResearchCacheEntry.key.in_(keys), ResearchCacheEntry.created_at >= cutoff)
+        ).all()
+        return {key: json.loads(payload) for key, payload in rows}
+
+    def set(self, key, data):
+        try:
+            db.session.merge(ResearchCacheEntry(key=key, payload=json.dumps(data), created_at=datetime.utcnow()))
+            db.session.commit()
+        except IntegrityError:
+            # Another process stored the same result first
+            db.session.rollback()
+            return
+        self._evict()
+
+    def _evict(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        db.session.execute(delete(ResearchCacheEntry).where(ResearchCacheEntry.created_at < cutoff))
+        excess = db.session.scalar(select(func.count()).select_from(ResearchCacheEntry)) - self.max_entries
+        if excess > 0:
+            oldest = select(ResearchCacheEntry.key).order_by(ResearchCacheEntry.created_at).limit(excess)
+            db.session.execute(delete(ResearchCacheEntry).where(ResearchCacheEntry.key.in_(oldest)))
+        db.session.commit()
+
+
+class ResearchCache:
+    """
+    Caches parsed research results by (normalized LinkedIn URL, prompt text, model).
+
+    The backend is chosen with RESEARCH_CACHE_BACKEND: 'memory', 'database' or
+    'none' to disable caching.
+    """
+
+    backends = {
+        'memory': MemoryCacheBackend,
+        'database': DatabaseCacheBackend,
+    }
+
+    def init_app(self, app):
+        backend = app.config['RESEARCH_CACHE_BACKEND']
+        if backend == 'none':
+            app.extensions['research_cache'] = None
+            return
+        if backend not in self.backends:
+            raise ValueError(f"Unknown RESEARCH_CACHE_BACKEND '{backend}'.")
+        app.extensions['research_cache'] = self.backends[backend](
+            ttl=app.config['RESEARCH_CACHE_TTL'],
+            max_entries=app.config['RESEARCH_CACHE_MAX_ENTRIES']
+        )
+
+    @property
+    def backend(self):
+        return current_app.extensions.get('research_cache')
+
+    def get_many(self, keys):
+        """Returns a dict of the cached results found for the given keys."""
+        if self.backend is None or not keys:
+            return {}
+        return self.backend.get_many(list(keys))
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set(self, key, data):
+        if self.backend is not None:
+            self.backend.set(key, data)
+
+
+research_cache = ResearchCache()
@@ -0,0 +1,74 @@
+import time
+import hashlib
+
+from flask import current_app, request, session, render_template, Response
+from flask_login import current_user
+from markupsafe import Markup
+
+from app.cache import MemoryCacheBackend
+
+
+def page_etag(*parts):
+    """
+    Returns an ETag for a page of the signed-in user built from the values it depends on.
+
+    The user, their theme, the URL and the CSRF token in the page's forms are always
+    part of it, and the ETag changes every half CSRF time limit so that a
+    cached page never carries an expired token.
+    """
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    csrf_period = int(time.time() // (time_limit / 2)) if time_limit else 0
+    # Read the relationship directly; the settings property would add a row for new users
+    settings = current_user._settings
+    values = [current_user.id, settings.theme if settings else None, session.get('csrf_token'), csrf_period,
+              request.full_path, *parts]
+    return hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+
+
+def conditional_response(etag, last_modified):
+    """
+    Returns a 304 response when the client's copy of the page is current, otherwise an empty page response.
+
+    The caller renders the page into the returned response only when its status
+    is 200, so an unchanged page costs no template render. Browsers must
+    revalidate on every view. Pages with pending flash messages are not
+    cacheable, as the message is shown once.
+    """
+    response = Response()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+        return response
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    return response.make_conditional(request)
+
+
+class FragmentCache:
+    """
+    Rendered HTML of completed research cards, kept in each process.
+
+    A completed card only changes when its research is updated, so entries are
+    keyed by the research's updated_at and outdated entries are never hit
+    again; they age out of the LRU.
+    """
+
+    def init_app(self, app):
+        app.extensions['fragment_cache'] = MemoryCacheBackend(app.config['FRAGMENT_CACHE_TTL'],
+                                                              app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+        app.add_template_global(self.research_card)
+
+    def research_card(self, research):
+        """Returns the card of a research as HTML, from the cache when the research is completed."""
+        if research.status != 'Completed' or research.updated_at is None:
+            return Markup(render_template('_research_card.html', research=research))
+        cache = current_app.extensions['fragment_cache']
+        key = (research.id, research.updated_at, research.candidate.name)
+        html = cache.get_many([key]).get(key)
+        if html is None:
+            html = render_template('_research_card.html', research=research)
+            cache.set(key, html)
+        return Markup(html)
+
+
+fragment_cache = FragmentCache()
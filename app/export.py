@@ -0,0 +1,101 @@
+import io
+import csv
+import json
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Research, ResearchReport, Candidate
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+EXPORT_FIELDS = ['rank', 'candidate_name', 'linkedin_url', 'overall_score', 'status', 'summary',
+                 'prompt_id', 'research_model', 'route', 'research_id', 'updated_at']
+# Output is sent in chunks of about this many characters
+CHUNK_SIZE = 64 * 1024
+
+
+def export_rows(project_id, include_reports=False, batch_size=500, status=None, min_score=None, prompt_id=None):
+    """
+    Yields a project's research as dicts, best score first and unscored research last.
+
+    Rows are fetched `batch_size` at a time with a server-side cursor where the
+    database supports it, so memory use does not grow with the project.
+
+    Args:
+        include_reports: Add the decoded full report of each research as `full_report`.
+        status: Only include research in this status.
+        min_score: Only include research scored at least this much.
+        prompt_id: Only include research against this prompt version.
+    """
+    columns = [Research.id, Candidate.name, Candidate.linkedin_url, Research.overall_score, Research.status,
+               Research.summary, Research.prompt_id, Research.research_model, Research.route, Research.updated_at]
+    if include_reports:
+        columns += [ResearchReport.compression, ResearchReport.body]
+    query = (select(*columns)
+             .join(Candidate, Candidate.id == Research.candidate_id)
+             .where(Research.project_id == project_id))
+    if include_reports:
+        query = query.outerjoin(ResearchReport, ResearchReport.research_id == Research.id)
+    if status:
+        query = query.where(Research.status == status)
+    if min_score is not None:
+        query = query.where(Research.overall_score >= min_score)
+    if prompt_id is not None:
+        query = query.where(Research.prompt_id == prompt_id)
+    query = query.order_by(Research.overall_score.desc().nulls_last(), Research.id.desc())
+
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for rank, row in enumerate(result, start=1):
+        exported = {
+            'rank': rank,
+            'candidate_name': row.name,
+            'linkedin_url': row.linkedin_url,
+            'overall_score': row.overall_score,
+            'status': row.status,
+            'summary': row.summary,
+            'prompt_id': row.prompt_id,
+            'research_model': row.research_model,
+            'route': row.route,
+            'research_id': row.id,
+            'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+        }
+        if include_reports:
+            exported['full_report'] = ResearchReport.decode(row.compression, row.body)
+        yield exported
+
+
+def _spreadsheet_safe(value):
+    # Spreadsheets run cells starting with these characters as formulas
+    if isinstance(value, str) and value.startswith(('=', '+', '-', '@', '\t', '\r')):
+        return "'" + value
+    return value
+
+
+def csv_chunks(rows, fields):
+    """Yields the rows as CSV with a header line, in chunks of about CHUNK_SIZE characters."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_spreadsheet_safe(row.get(field)) for field in fields])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(rows):
+    """Yields the rows as JSON Lines, in chunks of about CHUNK_SIZE characters."""
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(lines)
+            lines, size = [], 0
+    yield ''.join(lines)
@@ -1,6 +1,11 @@
+import csv
+import io
+import re
+from urllib.parse import urlparse
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, SelectField
-from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, URL
+from flask_wtf.file import FileField, FileAllowed
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, SelectField, IntegerField
+from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, URL, Optional, NumberRange
 from app.models import User, Project
 
 class LoginForm(FlaskForm):
@@ -36,15 +41,54 @@ class ResearchForm(FlaskForm):
     linkedin_url = StringField('Candidate LinkedIn URL', validators=[DataRequired(), URL()])
     submit_research = SubmitField('Add Candidate and Perform Research')
 
+class BulkResearchForm(FlaskForm):
+    linkedin_urls = TextAreaField('Candidate LinkedIn URLs (one per line)')
+    csv_file = FileField('Or upload a CSV file', validators=[FileAllowed(['csv', 'txt'], 'CSV files only.')])
+    submit_bulk = SubmitField('Import Candidates and Perform Research')
+
+    def get_linkedin_urls(self):
+        """
+        Collects the URLs from the pasted text and the uploaded CSV.
+
+        Returns:
+            A tuple of (urls, invalid) where urls is the de-duplicated list of
+            valid URLs in submission order and invalid the entries that were skipped.
+        """
+        entries = re.split(r'[\s,;]+', self.linkedin_urls.data or '')
+        if self.csv_file.data:
+            content = self.csv_file.data.read().decode('utf-8-sig', errors='replace')
+            for row in csv.reader(io.StringIO(content)):
+                entries.extend(cell for cell in row if '://' in cell)
+
+        urls, invalid = [], []
+        for entry in (e.strip() for e in entries):
+            if not entry:
+                continue
+            parsed = urlparse(entry)
+            if parsed.scheme in ('http', 'https') and parsed.netloc:
+                urls.append(entry)
+            else:
+                invalid.append(entry)
+        return list(dict.fromkeys(urls)), invalid
+
 class SettingsForm(FlaskForm):
     dark_theme = BooleanField('Dark Mode')
     advanced_mode = BooleanField('Advanced Mode')
     research_model = SelectField('Research Model', choices=[
         ('sonar-deep-research', 'Sonar Deep Research'),
-        ('sonar-pro', 'Sonar Pro')
+        ('sonar-pro', 'Sonar Pro'),
+        ('routed', 'Sonar Pro screening, Deep Research for the shortlist')
     ])
     submit = SubmitField('Save Settings')
 
 class EditPromptForm(FlaskForm):
     text = TextAreaField('Master Prompt', validators=[DataRequired()])
     submit_prompt = SubmitField('Update Prompt')
+
+class RescoreForm(FlaskForm):
+    submit_rescore = SubmitField('Re-run Project Against Current Prompt')
+
+class RoutingForm(FlaskForm):
+    escalation_score = IntegerField('Deep research from score', validators=[Optional(), NumberRange(min=0, max=100)])
+    latency_budget = IntegerField('Latency budget (minutes)', validators=[Optional(), NumberRange(min=0)])
+    submit_routing = SubmitField('Save Routing')
@@ -0,0 +1,145 @@
+import os
+import time
+import hmac
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import g, request, Response, abort, current_app, has_request_context
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from sqlalchemy import event, select, func
+
+from app import db
+from app.models import Research
+
+# Research calls and queue waits last from seconds to tens of minutes
+RESEARCH_BUCKETS = (1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+REQUEST_LATENCY = Histogram(
+    'talia_http_request_duration_seconds', 'Time spent handling a request, by route.',
+    ['endpoint', 'method', 'status'])
+REQUEST_DB_STATEMENTS = Histogram(
+    'talia_http_request_db_statements', 'SQL statements executed while handling a request.',
+    ['endpoint'], buckets=(1, 2, 3, 4, 5, 8, 13, 21, 34, 55, 89))
+REQUEST_DB_SECONDS = Histogram(
+    'talia_http_request_db_seconds', 'Time spent in SQL statements while handling a request.',
+    ['endpoint'])
+DB_STATEMENT_SECONDS = Histogram(
+    'talia_db_statement_duration_seconds', 'Duration of SQL statements, in web requests or background workers.',
+    ['context'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+DB_STATEMENTS = Counter(
+    'talia_db_statements_total', 'SQL statements executed, in web requests or background workers.',
+    ['context'])
+DB_CONNECTIONS_CHECKED_OUT = Gauge(
+    'talia_db_connections_checked_out', 'Pooled database connections currently in use.',
+    multiprocess_mode='livesum')
+API_LATENCY = Histogram(
+    'talia_research_api_duration_seconds', 'Duration of research API calls, by model and outcome.',
+    ['model', 'outcome'], buckets=RESEARCH_BUCKETS)
+API_IN_FLIGHT = Gauge(
+    'talia_research_api_in_flight', 'Research API calls currently in flight, by model.',
+    ['model'], multiprocess_mode='livesum')
+STATUS_SECONDS = Histogram(
+    'talia_research_status_duration_seconds', 'Time a research spent in a status before leaving it.',
+    ['status'], buckets=RESEARCH_BUCKETS)
+QUEUE_DEPTH = Gauge(
+    'talia_research_jobs', 'Research jobs by status, read from the database when scraped.',
+    ['status'], multiprocess_mode='mostrecent')
+
+
+@contextmanager
+def track_api_call(model):
+    """Measures a research API call and counts it as in flight while it runs."""
+    in_flight = API_IN_FLIGHT.labels(model)
+    in_flight.inc()
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        in_flight.dec()
+        API_LATENCY.labels(model, outcome).observe(time.perf_counter() - start)
+
+
+def observe_status_duration(status, since):
+    """Records how long a research stayed in `status`, given when it entered it."""
+    if since is not None:
+        STATUS_SECONDS.labels(status).observe(max(0.0, (datetime.utcnow() - since).total_seconds()))
+
+
+class Metrics:
+    """
+    Prometheus metrics for requests, SQL statements and the research pipeline.
+
+    The metrics are served on /metrics to scrapers that send METRICS_TOKEN as
+    a bearer token; without a token configured the endpoint answers 404.
+    Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory so that
+    every worker process reports into the same scrape.
+    """
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'checkout', lambda *args: DB_CONNECTIONS_CHECKED_OUT.inc())
+        event.listen(engine, 'checkin', lambda *args: DB_CONNECTIONS_CHECKED_OUT.dec())
+
+    @staticmethod
+    def _start_request():
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_statements = 0
+        g.metrics_db_seconds = 0.0
+
+    @staticmethod
+    def _end_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_LATENCY.labels(endpoint, request.method, response.status_code).observe(time.perf_counter() - start)
+            REQUEST_DB_STATEMENTS.labels(endpoint).observe(g.metrics_db_statements)
+            REQUEST_DB_SECONDS.labels(endpoint).observe(g.metrics_db_seconds)
+        return response
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - getattr(context, '_metrics_start', time.perf_counter())
+        in_request = has_request_context() and 'metrics_start' in g
+        label = 'request' if in_request else 'worker'
+        DB_STATEMENTS.labels(label).inc()
+        DB_STATEMENT_SECONDS.labels(label).observe(elapsed)
+        if in_request:
+            g.metrics_db_statements += 1
+            g.metrics_db_seconds += elapsed
+
+    def metrics_view(self):
+        token = current_app.config['METRICS_TOKEN']
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401)
+
+        counts = dict(db.session.execute(
+            select(Research.status, func.count()).group_by(Research.status)
+        ).all())
+        for status in ('Pending', 'In Progress', 'Completed', 'Failed'):
+            QUEUE_DEPTH.labels(status).set(counts.get(status, 0))
+
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+metrics = Metrics()
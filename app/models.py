@@ -1,7 +1,12 @@
+import zlib
+
+from flask import current_app
 from app import db, login
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy import func, case, or_, and_, select, update
+from sqlalchemy.orm import load_only, joinedload, query_expression, with_expression
 
 @login.user_loader
 def load_user(id):
@@ -34,7 +39,9 @@ class User(UserMixin, db.Model):
 # Association table for the many-to-many relationship between Project and Candidate
 project_candidates = db.Table('project_candidates',
     db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True),
-    db.Column('candidate_id', db.Integer, db.ForeignKey('candidate.id'), primary_key=True)
+    db.Column('candidate_id', db.Integer, db.ForeignKey('candidate.id'), primary_key=True),
+    # The primary key already covers lookups by project_id
+    db.Index('ix_project_candidates_candidate_id', 'candidate_id')
 )
 
 class Project(db.Model):
@@ -48,14 +55,91 @@ class Project(db.Model):
         backref=db.backref('projects', lazy='dynamic'),
         lazy='dynamic'
     )
-    prompts = db.relationship('Prompt', backref='project', lazy='dynamic', order_by=lambda: Prompt.created_at.desc(), cascade="all, delete-orphan")
+    prompts = db.relationship('Prompt', backref='project', lazy='dynamic', order_by=lambda: Prompt.created_at.desc(), cascade="all, delete-orphan", foreign_keys='Prompt.project_id')
+    # Points at the latest prompt so it can be loaded without an ordered query
+    current_prompt_id = db.Column(db.Integer, db.ForeignKey('prompt.id', use_alter=True, name='fk_project_current_prompt_id'))
+    current_prompt = db.relationship('Prompt', foreign_keys=[current_prompt_id], post_update=True)
+    # Denormalized counters, kept up to date in the same transaction as the
+    # research and candidate changes (see adjust_counters and recount)
+    research_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    candidate_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    in_progress_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    completed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    failed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Routed research settings; None falls back to RESEARCH_ESCALATION_SCORE and no budget
+    escalation_score = db.Column(db.Integer)
+    latency_budget = db.Column(db.Integer)  # seconds
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Latest updated_at of the project's research, populated by with_last_research_update()
+    last_research_update = query_expression()
+
+    __table_args__ = (
+        # The dashboard lists a user's projects newest first
+        db.Index('ix_project_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    STATUS_COUNTERS = {
+        'Pending': 'pending_count',
+        'In Progress': 'in_progress_count',
+        'Completed': 'completed_count',
+        'Failed': 'failed_count',
+    }
+
+    @classmethod
+    def with_last_research_update(cls):
+        """Query option that loads last_research_update along with the project."""
+        return with_expression(cls.last_research_update,
+                               select(func.max(Research.updated_at))
+                               .where(Research.project_id == cls.id)
+                               .scalar_subquery())
+
+    @property
+    def last_modified(self):
+        """When the project or any of its research last changed."""
+        return max(filter(None, [self.updated_at, self.last_research_update]), default=None)
+
     @property
     def master_prompt(self):
-        latest_prompt = self.prompts.first()
-        return latest_prompt.text if latest_prompt else "No prompt set."
+        return self.current_prompt.text if self.current_prompt else "No prompt set."
+
+    @classmethod
+    def adjust_counters(cls, project_id, **deltas):
+        """Adds the given deltas to counter columns of a project as part of the current transaction."""
+        values = {name: getattr(cls, name) + delta for name, delta in deltas.items() if delta}
+        if values:
+            db.session.execute(
+                update(cls).where(cls.id == project_id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+
+    @classmethod
+    def count_status_change(cls, project_id, old_status, new_status):
+        """Moves one research of a project from one status counter to another."""
+        if old_status != new_status:
+            cls.adjust_counters(project_id, **{cls.STATUS_COUNTERS[old_status]: -1, cls.STATUS_COUNTERS[new_status]: 1})
+
+    @classmethod
+    def recount(cls, project_ids):
+        """Recomputes the counters of the given projects from the research and candidate tables."""
+        if not project_ids:
+            return
+
+        def count_research(*criteria):
+            return select(func.count(Research.id)).where(Research.project_id == cls.id, *criteria).scalar_subquery()
+
+        values = {counter: count_research(Research.status == status) for status, counter in cls.STATUS_COUNTERS.items()}
+        values['research_count'] = count_research()
+        values['candidate_count'] = (select(func.count())
+                                     .select_from(project_candidates)
+                                     .where(project_candidates.c.project_id == cls.id)
+                                     .scalar_subquery())
+        db.session.execute(
+            update(cls).where(cls.id.in_(project_ids)).values(**values)
+            .execution_options(synchronize_session=False)
+        )
 
     def __repr__(self):
         return f'<Project {self.name}>'
@@ -73,21 +157,156 @@ class Candidate(db.Model):
 
 class Research(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    status = db.Column(db.String(20), nullable=False, default='Pending')
+    status = db.Column(db.String(20), nullable=False, default='Pending', index=True)
     prompt_id = db.Column(db.Integer, db.ForeignKey('prompt.id'))
     prompt = db.relationship('Prompt', backref='researches')
     overall_score = db.Column(db.Integer)
     summary = db.Column(db.Text)
-    full_report = db.Column(db.Text)
-    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'))
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # The full report is kept in its own table so that research rows stay small;
+    # only the detail page loads it (see ResearchReport)
+    report = db.relationship('ResearchReport', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
+    # Response text received so far while a streamed research call is running
+    partial_output = db.Column(db.Text)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'))
+    research_model = db.Column(db.String(50))
+    # 'screening' or 'deep' for the two passes of routed research, None otherwise.
+    # A deep pass points at the screening pass that escalated it.
+    route = db.Column(db.String(20))
+    parent_id = db.Column(db.Integer, db.ForeignKey('research.id'), index=True)
+    parent = db.relationship('Research', remote_side=[id], backref=db.backref('escalations', lazy='dynamic'))
+    # Hash of (LinkedIn URL, prompt text, model), the same as the research cache key.
+    # Only one research per key is in progress at a time; the others wait for its result.
+    request_key = db.Column(db.String(64), index=True)
+    # Set by the research worker that claimed this job (see app/worker.py)
+    claimed_by = db.Column(db.String(128))
+    claimed_at = db.Column(db.DateTime)
+    # Renewed by the claiming process while it is alive; the lease runs from here
+    heartbeat_at = db.Column(db.DateTime)
+    # Number of API calls made so far, and when a failed job may be retried
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Only populated by list_query(), which leaves the large Text columns unloaded
+    summary_preview = query_expression()
+    partial_output_preview = query_expression()
+
+    __table_args__ = (
+        db.Index('ix_research_project_id_overall_score', 'project_id', 'overall_score', 'id'),
+        # The project page's event stream polls for recently updated research
+        db.Index('ix_research_project_id_updated_at', 'project_id', 'updated_at'),
+        db.Index('uq_research_request_key_in_flight', 'request_key', unique=True,
+                 postgresql_where=db.text("status = 'In Progress'"),
+                 sqlite_where=db.text("status = 'In Progress'")),
+    )
+
+    SUMMARY_PREVIEW_LENGTH = 500
+
+    @property
+    def full_report(self):
+        return self.report.text if self.report is not None else None
+
+    @full_report.setter
+    def full_report(self, text):
+        if text is None:
+            self.report = None
+        elif self.report is None:
+            self.report = ResearchReport(**ResearchReport.encode(text))
+        else:
+            for name, value in ResearchReport.encode(text).items():
+                setattr(self.report, name, value)
+
+    @classmethod
+    def list_query(cls, project_id):
+        """Query for the research cards of a project, loading only what the cards display."""
+        return (cls.query
+                .options(
+                    load_only(cls.id, cls.status, cls.overall_score, cls.candidate_id,
+                              cls.prompt_id, cls.project_id, cls.research_model, cls.route,
+                              cls.parent_id, cls.attempts, cls.updated_at),
+                    with_expression(cls.summary_preview, func.substr(cls.summary, 1, cls.SUMMARY_PREVIEW_LENGTH)),
+                    with_expression(cls.partial_output_preview,
+                                    case((cls.status != 'Completed', cls.partial_output), else_=None)),
+                    joinedload(cls.candidate))
+                .filter(cls.project_id == project_id))
+
+    @classmethod
+    def list_page(cls, project_id, per_page, after=None, status=None, min_score=None, prompt_id=None):
+        """
+        Returns one page of a project's research cards and the cursor of the next page.
+
+        Research is ordered by score, unscored research first, and pages seek on
+        (overall_score, id) so that every page costs the same however deep it is.
+
+        Args:
+            after: The cursor returned with the previous page, if any.
+            status: Only include research in this status.
+            min_score: Only include research scored at least this much.
+            prompt_id: Only include research against this prompt version.
+        """
+        query = cls.list_query(project_id)
+        if status:
+            query = query.filter(cls.status == status)
+        if min_score is not None:
+            query = query.filter(cls.overall_score >= min_score)
+        if prompt_id is not None:
+            query = query.filter(cls.prompt_id == prompt_id)
+        if after:
+            score, research_id = after.split(':')
+            if score == '':
+                query = query.filter(or_(cls.overall_score.isnot(None),
+                                         and_(cls.overall_score.is_(None), cls.id < int(research_id))))
+            else:
+                query = query.filter(or_(cls.overall_score < int(score),
+                                         and_(cls.overall_score == int(score), cls.id < int(research_id))))
+
+        researches = query.order_by(cls.overall_score.desc().nulls_first(), cls.id.desc()).limit(per_page + 1).all()
+        next_cursor = None
+        if len(researches) > per_page:
+            researches = researches[:per_page]
+            last = researches[-1]
+            next_cursor = f"{'' if last.overall_score is None else last.overall_score}:{last.id}"
+        return researches, next_cursor
+
     def __repr__(self):
         return f'<Research {self.id}>'
 
+class ResearchReport(db.Model):
+    research_id = db.Column(db.Integer, db.ForeignKey('research.id', ondelete='CASCADE'), primary_key=True)
+    # 'zlib', or None for plain UTF-8
+    compression = db.Column(db.String(16))
+    body = db.Column(db.LargeBinary, nullable=False)
+
+    @staticmethod
+    def encode(text):
+        """Returns the column values storing a report, compressed as set by REPORT_COMPRESSION."""
+        body = text.encode('utf-8')
+        if current_app.config['REPORT_COMPRESSION'] == 'zlib':
+            compressed = zlib.compress(body)
+            # Very short reports come out larger
+            if len(compressed) < len(body):
+                return {'compression': 'zlib', 'body': compressed}
+        return {'compression': None, 'body': body}
+
+    @staticmethod
+    def decode(compression, body):
+        """Returns the text of a report stored with the given compression."""
+        if body is None:
+            return None
+        if compression == 'zlib':
+            body = zlib.decompress(body)
+        return body.decode('utf-8')
+
+    @property
+    def text(self):
+        return self.decode(self.compression, self.body)
+
+    def __repr__(self):
+        return f'<ResearchReport for Research {self.research_id}>'
+
 class UserSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     theme = db.Column(db.String(10), nullable=False, default='light')
@@ -105,5 +324,27 @@ class Prompt(db.Model):
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Serves the "latest prompt of a project" lookup
+        db.Index('ix_prompt_project_id_created_at', 'project_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Prompt {self.id} for Project {self.project_id}>'
+
+class ResearchCacheEntry(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<ResearchCacheEntry {self.key}>'
+
+class RateLimitBucket(db.Model):
+    name = db.Column(db.String(64), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    # Seconds since the epoch, comparable across processes and hosts
+    updated_at = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<RateLimitBucket {self.name}>'
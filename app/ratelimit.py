@@ -0,0 +1,181 @@
+import time
+import random
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+import openai
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import RateLimitBucket
+
+
+class MemoryTokenBucket:
+    """A token bucket shared by the threads (and event loop) of one process."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self):
+        """Takes a token and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def pause(self, seconds):
+        """Makes every caller wait at least `seconds` for its next token."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class DatabaseTokenBucket:
+    """A token bucket stored in the `rate_limit_bucket` table, shared by all processes."""
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+
+    def _locked_bucket(self):
+        bucket = db.session.execute(
+            select(RateLimitBucket).where(RateLimitBucket.name == self.name).with_for_update()
+        ).scalar_one_or_none()
+        if bucket is None:
+            db.session.add(RateLimitBucket(name=self.name, tokens=self.capacity, updated_at=time.time()))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another process created the bucket first
+                db.session.rollback()
+            return self._locked_bucket()
+        now = time.time()
+        bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated_at) * self.rate)
+        bucket.updated_at = now
+        return bucket
+
+    def reserve(self):
+        try:
+            bucket = self._locked_bucket()
+            bucket.tokens -= 1
+            wait = max(0.0, -bucket.tokens / self.rate)
+            db.session.commit()
+            return wait
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def pause(self, seconds):
+        try:
+            bucket = self._locked_bucket()
+            bucket.tokens = min(bucket.tokens, -seconds * self.rate)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class RateLimiter:
+    """
+    Per-provider token buckets that pace the research API calls.
+
+    RATE_LIMIT_BACKEND selects a bucket per process ('memory') or one shared by
+    every process through the database ('database'). The rate of a provider is
+    read from <PROVIDER>_RATE_LIMIT (requests per minute) and <PROVIDER>_RATE_BURST.
+    """
+
+    def init_app(self, app):
+        app.extensions['rate_limiter'] = {}
+
+    def _bucket(self, provider):
+        buckets = current_app.extensions['rate_limiter']
+        bucket = buckets.get(provider)
+        if bucket is None:
+            rate = current_app.config[f'{provider.upper()}_RATE_LIMIT'] / 60.0
+            capacity = current_app.config[f'{provider.upper()}_RATE_BURST']
+            if current_app.config['RATE_LIMIT_BACKEND'] == 'database':
+                bucket = DatabaseTokenBucket(provider, rate, capacity)
+            else:
+                bucket = MemoryTokenBucket(rate, capacity)
+            bucket = buckets.setdefault(provider, bucket)
+        return bucket
+
+    def acquire(self, provider):
+        """Blocks until a call to the provider is allowed."""
+        wait = self._bucket(provider).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, provider):
+        """Async variant of `acquire`."""
+        bucket = self._bucket(provider)
+        if isinstance(bucket, DatabaseTokenBucket):
+            app = current_app._get_current_object()
+
+            def reserve():
+                with app.app_context():
+                    return bucket.reserve()
+
+            wait = await asyncio.to_thread(reserve)
+        else:
+            wait = bucket.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, provider, seconds):
+        """Holds back every caller of the provider, e.g. after it answered with Retry-After."""
+        self._bucket(provider).pause(seconds)
+
+
+rate_limiter = RateLimiter()
+
+
+def is_retryable(error):
+    """Whether a failed API call is worth retrying: rate limits, server errors and network failures."""
+    return isinstance(error, (openai.RateLimitError, openai.InternalServerError,
+                              openai.APIConnectionError, httpx.TransportError))
+
+
+def retry_after(error):
+    """Returns the delay in seconds requested by the provider's Retry-After header, if any."""
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(error, attempt, base_delay, max_delay):
+    """
+    Returns how long to wait before the next attempt of a failed call.
+
+    Honors Retry-After when the provider sends it, otherwise uses exponential
+    backoff with full jitter so that retries from many workers spread out.
+    """
+    requested = retry_after(error)
+    if requested is not None:
+        return min(requested, max_delay)
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
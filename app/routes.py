@@ -1,11 +1,18 @@
 from flask import Blueprint, render_template, flash, redirect, url_for, request, Response, stream_with_context, abort, current_app
 import json
-import threading
+import time
+from datetime import datetime
+from werkzeug.utils import secure_filename
+from sqlalchemy import select, delete
+from sqlalchemy.orm import joinedload
 from flask_login import login_user, logout_user, current_user, login_required
 from app import db
-from app.models import User, Candidate, Research, Project, Prompt
-from app.forms import LoginForm, RegistrationForm, ResearchForm, ProjectForm, SettingsForm, EditPromptForm
-from app.services import get_profile_from_linkedin_url
+from app.models import User, Candidate, Research, ResearchReport, Project, Prompt, project_candidates
+from app.forms import LoginForm, RegistrationForm, ResearchForm, BulkResearchForm, ProjectForm, SettingsForm, EditPromptForm, RoutingForm, RescoreForm
+from app.worker import research_executor, enqueue_research, candidates_to_rescore
+from app.search import search_index
+from app.caching import page_etag, conditional_response, fragment_cache
+from app.export import EXPORT_FORMATS, EXPORT_FIELDS, export_rows, csv_chunks, jsonl_chunks
 
 bp = Blueprint('main', __name__)
 
@@ -30,6 +37,7 @@ def dashboard():
             prompt_text += f" {current_app.config['APPEND_PROMPT']}"
         initial_prompt = Prompt(text=prompt_text, project=project)
         db.session.add(initial_prompt)
+        project.current_prompt = initial_prompt
         db.session.commit()
         flash('Your project has been created!')
         return redirect(url_for('main.dashboard'))
@@ -39,9 +47,15 @@ def dashboard():
 @bp.route('/project/<int:project_id>', methods=['GET', 'POST'])
 @login_required
 def project(project_id):
-    project = Project.query.get_or_404(project_id)
+    project = (Project.query
+               .options(joinedload(Project.current_prompt), Project.with_last_research_update())
+               .filter_by(id=project_id)
+               .first_or_404())
     research_form = ResearchForm()
+    bulk_form = BulkResearchForm()
     prompt_form = EditPromptForm()
+    routing_form = RoutingForm()
+    rescore_form = RescoreForm()
 
     if prompt_form.submit_prompt.data and prompt_form.validate():
         prompt_text = prompt_form.text.data
@@ -49,104 +63,200 @@ def project(project_id):
             prompt_text += f" {current_app.config['APPEND_PROMPT']}"
         new_prompt = Prompt(text=prompt_text, project_id=project.id)
         db.session.add(new_prompt)
+        project.current_prompt = new_prompt
         db.session.commit()
         flash('Master prompt has been updated.')
         return redirect(url_for('main.project', project_id=project.id))
 
-    if research_form.submit_research.data and research_form.validate():
-        candidate = Candidate.query.filter_by(linkedin_url=research_form.linkedin_url.data).first()
-        if candidate is None:
-            candidate = Candidate(linkedin_url=research_form.linkedin_url.data)
-            db.session.add(candidate)
-        
-        if candidate not in project.candidates:
-            project.candidates.append(candidate)
-
-        research = Research(
-            candidate=candidate,
-            project=project,
-            user=current_user,
-            prompt=project.prompts.first(),
-            status='Pending'
-        )
-        db.session.add(research)
+    if routing_form.submit_routing.data and routing_form.validate():
+        project.escalation_score = routing_form.escalation_score.data
+        latency_budget = routing_form.latency_budget.data
+        project.latency_budget = latency_budget * 60 if latency_budget is not None else None
         db.session.commit()
+        flash('Research routing has been updated.')
+        return redirect(url_for('main.project', project_id=project.id))
+
+    if research_form.submit_research.data and research_form.validate():
+        if not research_executor.has_capacity():
+            flash('The research queue is full. Please try again in a few minutes.', 'warning')
+            return redirect(url_for('main.project', project_id=project.id))
+
+        enqueue_research(project, current_user, [research_form.linkedin_url.data])
+
+        flash('Research has been queued. The page will update once it is complete.', 'info')
+        return redirect(url_for('main.project', project_id=project.id))
 
-        # Run research in a background thread
-        project_prompt = project.prompts.first().text if project.prompts.first() else ""
-        thread = threading.Thread(target=background_research, args=(current_app._get_current_object(), research.id, research_form.linkedin_url.data, project_prompt, current_user.settings.research_model))
-        thread.start()
+    if bulk_form.submit_bulk.data and bulk_form.validate():
+        linkedin_urls, invalid = bulk_form.get_linkedin_urls()
+        if invalid:
+            flash(f'Skipped {len(invalid)} entries that are not valid URLs.', 'warning')
+        if not linkedin_urls:
+            flash('No LinkedIn URLs were found in the submission.', 'warning')
+            return redirect(url_for('main.project', project_id=project.id))
+        if len(linkedin_urls) > current_app.config['BULK_IMPORT_MAX']:
+            flash(f"A bulk import is limited to {current_app.config['BULK_IMPORT_MAX']} candidates.", 'danger')
+            return redirect(url_for('main.project', project_id=project.id))
+        if not research_executor.has_capacity(len(linkedin_urls)):
+            flash('The research queue is full. Please try again in a few minutes.', 'warning')
+            return redirect(url_for('main.project', project_id=project.id))
 
-        flash('Research has been started in the background. The page will update once it is complete.', 'info')
+        queued = enqueue_research(project, current_user, linkedin_urls)
+        flash(f'Research has been queued for {queued} candidates.', 'info')
         return redirect(url_for('main.project', project_id=project.id))
 
+    if rescore_form.submit_rescore.data and rescore_form.validate():
+        linkedin_urls, skipped = candidates_to_rescore(project)
+        if not linkedin_urls:
+            flash('Every candidate has already been scored against the current prompt.', 'info')
+            return redirect(url_for('main.project', project_id=project.id))
+        free = research_executor.free_capacity()
+        if not free:
+            flash('The research queue is full. Please try again in a few minutes.', 'warning')
+            return redirect(url_for('main.project', project_id=project.id))
+
+        # Queue what fits; running the re-score again picks up the rest
+        queued = enqueue_research(project, current_user, linkedin_urls[:free])
+        message = f'Re-scoring {queued} candidates against the current prompt.'
+        if skipped:
+            message += f' Skipped {skipped} already scored against it.'
+        if len(linkedin_urls) > free:
+            message += f' The queue is full; re-run the project later for the remaining {len(linkedin_urls) - free}.'
+        flash(message, 'info')
+        return redirect(url_for('main.project', project_id=project.id))
+
+    # Repeat views of an unchanged project are answered without rendering it
+    response = conditional_response(page_etag(project.id, project.last_modified, project.current_prompt_id),
+                                    project.last_modified)
+    if response.status_code == 304:
+        return response
+
+    prompt = project.current_prompt
+    if request.method == 'GET' and prompt:
+        prompt_form.text.data = prompt.text
     if request.method == 'GET':
-        prompt = project.prompts.first()
-        if prompt:
-            prompt_form.text.data = prompt.text
+        routing_form.escalation_score.data = project.escalation_score
+        routing_form.latency_budget.data = project.latency_budget // 60 if project.latency_budget is not None else None
 
-    researches = Research.query.filter_by(project_id=project.id).order_by(Research.overall_score.desc()).all()
-    return render_template('project.html', title=project.name, project=project, research_form=research_form, prompt_form=prompt_form, researches=researches)
+    filters = {
+        'status': request.args.get('status') or None,
+        'min_score': request.args.get('min_score', type=int),
+        'prompt_id': request.args.get('prompt_id', type=int),
+    }
+    try:
+        researches, next_cursor = Research.list_page(project.id, current_app.config['RESEARCH_PAGE_SIZE'],
+                                                     after=request.args.get('after'), **filters)
+    except ValueError:
+        abort(400)
+    last_update = max((r.updated_at for r in researches if r.updated_at), default=datetime.utcnow())
+    response.set_data(render_template('project.html', title=project.name, project=project, prompt=prompt, research_form=research_form, bulk_form=bulk_form, prompt_form=prompt_form, routing_form=routing_form, rescore_form=rescore_form, researches=researches, last_update=last_update.isoformat(),
+                                      filters=filters, next_cursor=next_cursor, is_first_page=not request.args.get('after')))
+    return response
+
+@bp.route('/project/<int:project_id>/events')
+@login_required
+def project_events(project_id):
+    """Streams the research cards of a project that changed since the page was rendered, as Server-Sent Events."""
+    project = Project.query.get_or_404(project_id)
+    if project.user_id != current_user.id:
+        abort(403)
+
+    # EventSource sends the id of the last event it received when it reconnects
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_seen = datetime.fromisoformat(since)
+    except (TypeError, ValueError):
+        last_seen = datetime.utcnow()
+
+    poll_interval = current_app.config['SSE_POLL_INTERVAL']
+    deadline = time.monotonic() + current_app.config['SSE_MAX_DURATION']
+
+    def generate():
+        nonlocal last_seen
+        while time.monotonic() < deadline:
+            # Checked before reading the changes, so that a job completing in
+            # between is still sent before the stream ends
+            active = (db.session.query(Research.id)
+                      .filter(Research.project_id == project_id, Research.status.in_(['Pending', 'In Progress']))
+                      .first())
+            changed = (Research.list_query(project_id)
+                       .filter(Research.updated_at > last_seen)
+                       .order_by(Research.updated_at)
+                       .all())
+            for research in changed:
+                last_seen = research.updated_at
+                payload = json.dumps({
+                    'id': research.id,
+                    'status': research.status,
+                    'html': fragment_cache.research_card(research),
+                })
+                yield f"id: {last_seen.isoformat()}\nevent: research\ndata: {payload}\n\n"
+
+            # Return the connection to the pool while the stream is idle
+            db.session.close()
+            if active is None:
+                yield "event: done\ndata: {}\n\n"
+                return
+            yield ": keep-alive\n\n"
+            time.sleep(poll_interval)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/project/<int:project_id>/export')
+@login_required
+def project_export(project_id):
+    """Streams a project's research, best score first, as CSV or JSON Lines with the project page's filters."""
+    project = Project.query.get_or_404(project_id)
+    if project.user_id != current_user.id:
+        abort(403)
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        abort(400)
+
+    include_reports = request.args.get('reports', type=int) == 1
+    filters = {
+        'status': request.args.get('status') or None,
+        'min_score': request.args.get('min_score', type=int),
+        'prompt_id': request.args.get('prompt_id', type=int),
+    }
+    rows = export_rows(project.id, include_reports=include_reports,
+                       batch_size=current_app.config['EXPORT_BATCH_SIZE'], **filters)
+    if export_format == 'csv':
+        chunks = csv_chunks(rows, EXPORT_FIELDS + (['full_report'] if include_reports else []))
+    else:
+        chunks = jsonl_chunks(rows)
+    filename = f"{secure_filename(project.name) or 'project'}-{project.id}.{export_format}"
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"', 'X-Accel-Buffering': 'no'})
 
 @bp.route('/research/<int:research_id>')
 @login_required
 def research_detail(research_id):
-    research = Research.query.get_or_404(research_id)
-    if research.project.creator != current_user:
+    research = (Research.query
+                .options(joinedload(Research.project), joinedload(Research.candidate), joinedload(Research.prompt),
+                         joinedload(Research.report),
+                         joinedload(Research.parent).load_only(Research.id, Research.research_model))
+                .filter_by(id=research_id)
+                .first_or_404())
+    if research.project.user_id != current_user.id:
         abort(403)
-    return render_template('research_detail.html', title='Research Details', research=research)
+    response = conditional_response(page_etag(research.id, research.updated_at, research.project.name),
+                                    research.updated_at)
+    if response.status_code == 304:
+        return response
+    response.set_data(render_template('research_detail.html', title='Research Details', research=research))
+    return response
 
-def background_research(app, research_id, linkedin_url, project_prompt, research_model):
-    with app.app_context():
-        app.logger.info(f"[Thread-{research_id}] Starting background research for {linkedin_url}")
-        research = Research.query.get(research_id)
-        if not research:
-            app.logger.warning(f"[Thread-{research_id}] Research with ID {research_id} not found.")
-            return
-
-        research.status = 'In Progress'
-        db.session.commit()
-        app.logger.info(f"[Thread-{research_id}] Status set to 'In Progress'.")
-
-        try:
-            app.logger.info(f"[Thread-{research_id}] Calling Perplexity API with model {research_model}.")
-            research_result = get_profile_from_linkedin_url(
-                linkedin_url=linkedin_url,
-                project_prompt=project_prompt,
-                research_model=research_model
-            )
-            app.logger.info(f"[Thread-{research_id}] Received response from Perplexity API.")
-            
-            if research_result.strip().startswith('```json'):
-                cleaned_response = research_result.strip()[7:-3].strip()
-            else:
-                cleaned_response = research_result
-
-            try:
-                app.logger.info(f"[Thread-{research_id}] Parsing JSON response.")
-                data = json.loads(cleaned_response)
-            except json.JSONDecodeError as e:
-                app.logger.error(f"[Thread-{research_id}] Failed to decode JSON from API response: {e}")
-                app.logger.error(f"[Thread-{research_id}] Raw response received: {research_result}")
-                raise
-            
-            if research.candidate:
-                research.candidate.name = data.get('candidate_name')
-
-            research.summary = data.get('summary')
-            research.full_report = data.get('full_report')
-            research.overall_score = data.get('overall_score')
-            research.status = 'Completed'
-            app.logger.info(f"[Thread-{research_id}] Research completed successfully.")
-
-        except Exception as e:
-            app.logger.error(f"[Thread-{research_id}] An error occurred during research: {e}", exc_info=True)
-            research.status = 'Failed'
-            research.summary = f"An error occurred during research: {e}"
-        
-        finally:
-            db.session.commit()
-            app.logger.info(f"[Thread-{research_id}] Final status '{research.status}' committed to database.")
+@bp.route('/search')
+@login_required
+def search():
+    """Full-text search over the reports of the current user's research, best match first."""
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_next = search_index.search(current_user.id, query, page=page,
+                                            per_page=current_app.config['SEARCH_PAGE_SIZE'])
+    return render_template('search.html', title='Search', query=query, results=results, page=page,
+                           has_next=has_next, enabled=search_index.enabled)
 
 @bp.route('/delete_candidate/<int:candidate_id>', methods=['POST'])
 @login_required
@@ -162,7 +272,18 @@ def delete_candidate(candidate_id):
     if project.user_id != current_user.id:
         abort(403)
 
+    # The candidate's research and memberships in every project are deleted with it
+    affected_project_ids = set(db.session.execute(
+        select(Research.project_id).where(Research.candidate_id == candidate.id)
+        .union(select(project_candidates.c.project_id).where(project_candidates.c.candidate_id == candidate.id))
+    ).scalars())
+    research_ids = select(Research.id).where(Research.candidate_id == candidate.id)
+    search_index.remove(db.session.execute(research_ids).scalars())
+    # Reports are not loaded to be deleted with their research
+    db.session.execute(delete(ResearchReport).where(ResearchReport.research_id.in_(research_ids)))
     db.session.delete(candidate)
+    db.session.flush()
+    Project.recount(affected_project_ids)
     db.session.commit()
     flash('Candidate and all associated research have been deleted.', 'success')
     return redirect(url_for('main.project', project_id=project_id))
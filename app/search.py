@@ -0,0 +1,190 @@
+import re
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, event, text, bindparam, select
+from sqlalchemy.orm import joinedload, load_only
+
+from app import db
+from app.models import Research, ResearchReport
+
+# Marks the matched terms in snippets; replaced by <mark> after HTML escaping
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+
+
+def highlight(snippet):
+    """Returns a snippet as HTML with the matched terms wrapped in <mark>."""
+    html = str(escape(snippet or ''))
+    return Markup(html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+
+def research_documents(research_ids):
+    """Returns the id, summary and full report text of the given research, as dicts."""
+    rows = db.session.execute(
+        select(Research.id, Research.summary, ResearchReport.compression, ResearchReport.body)
+        .outerjoin(ResearchReport, ResearchReport.research_id == Research.id)
+        .where(Research.id.in_(research_ids))
+    ).all()
+    return [{'id': research_id, 'summary': summary or '', 'full_report': ResearchReport.decode(compression, body) or ''}
+            for research_id, summary, compression, body in rows]
+
+
+class PostgresSearchBackend:
+    """
+    A `tsvector` per completed research in the `research_search` table, with a GIN index.
+
+    The summary is weighted above the full report so that candidates whose
+    summary mentions a term rank first. Reports may be stored compressed, so
+    documents and headlines are built from text decoded in Python.
+    """
+
+    schema = [
+        'CREATE TABLE IF NOT EXISTS research_search ('
+        ' research_id INTEGER PRIMARY KEY REFERENCES research (id) ON DELETE CASCADE,'
+        ' document TSVECTOR NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_research_search_document ON research_search USING GIN (document)',
+    ]
+
+    def index(self, documents):
+        db.session.execute(text(
+            "INSERT INTO research_search (research_id, document) "
+            "VALUES (:id, setweight(to_tsvector('english', :summary), 'A') || "
+            "setweight(to_tsvector('english', :full_report), 'B')) "
+            "ON CONFLICT (research_id) DO UPDATE SET document = excluded.document"
+        ), documents)
+
+    def remove(self, research_ids):
+        db.session.execute(text('DELETE FROM research_search WHERE research_id IN :ids')
+                           .bindparams(bindparam('ids', expanding=True)), {'ids': list(research_ids)})
+
+    def search(self, user_id, query, limit, offset):
+        rows = db.session.execute(text(
+            "SELECT r.id, ts_rank(s.document, q) AS rank "
+            "FROM research_search s "
+            "JOIN research r ON r.id = s.research_id "
+            "JOIN project p ON p.id = r.project_id, "
+            "websearch_to_tsquery('english', :query) q "
+            "WHERE s.document @@ q AND p.user_id = :user_id "
+            "ORDER BY rank DESC, r.id DESC LIMIT :limit OFFSET :offset"
+        ), {'query': query, 'user_id': user_id, 'limit': limit, 'offset': offset}).all()
+        if not rows:
+            return []
+        # Headlines only for the page of results, over the decoded text
+        documents = research_documents([research_id for research_id, rank in rows])
+        snippets = dict(db.session.execute(text(
+            "SELECT d.id, ts_headline('english', d.body, websearch_to_tsquery('english', :query), "
+            f"'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=2, MaxWords=20, MinWords=8') "
+            "FROM unnest(CAST(:ids AS INTEGER[]), CAST(:bodies AS TEXT[])) AS d(id, body)"
+        ), {'query': query, 'ids': [document['id'] for document in documents],
+            'bodies': [f"{document['summary']} {document['full_report']}" for document in documents]}).all())
+        return [(research_id, rank, snippets.get(research_id)) for research_id, rank in rows]
+
+
+class SqliteSearchBackend:
+    """An FTS5 table `research_fts` whose rowid is the research id, ranked with BM25."""
+
+    schema = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS research_fts USING fts5(summary, full_report, tokenize='porter unicode61')",
+    ]
+
+    def index(self, documents):
+        self.remove([document['id'] for document in documents])
+        db.session.execute(text(
+            "INSERT INTO research_fts (rowid, summary, full_report) VALUES (:id, :summary, :full_report)"
+        ), documents)
+
+    def remove(self, research_ids):
+        db.session.execute(text('DELETE FROM research_fts WHERE rowid IN :ids')
+                           .bindparams(bindparam('ids', expanding=True)), {'ids': list(research_ids)})
+
+    @staticmethod
+    def _match_expression(query):
+        # Every word must match; quoting keeps FTS5 operators in user input literal
+        return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+    def search(self, user_id, query, limit, offset):
+        match = self._match_expression(query)
+        if not match:
+            return []
+        return db.session.execute(text(
+            "SELECT r.id, -bm25(research_fts, 2.0, 1.0) AS rank, "
+            f"snippet(research_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 24) AS snippet "
+            "FROM research_fts "
+            "JOIN research r ON r.id = research_fts.rowid "
+            "JOIN project p ON p.id = r.project_id "
+            "WHERE research_fts MATCH :match AND p.user_id = :user_id "
+            "ORDER BY bm25(research_fts, 2.0, 1.0), r.id DESC LIMIT :limit OFFSET :offset"
+        ), {'match': match, 'user_id': user_id, 'limit': limit, 'offset': offset}).all()
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+}
+
+# Tables created with db.create_all() (e.g. by the benchmarks) get the index too
+for dialect, backend in BACKENDS.items():
+    for statement in backend.schema:
+        event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect=dialect))
+
+
+class SearchIndex:
+    """
+    Full-text index over the summaries and reports of completed research.
+
+    PostgreSQL uses a `tsvector` column with a GIN index and SQLite an FTS5
+    table; other databases have no search. Research is added to the index in
+    the transaction that completes it.
+    """
+
+    def init_app(self, app):
+        with app.app_context():
+            dialect = db.engine.dialect.name
+        backend = BACKENDS.get(dialect)
+        app.extensions['search_index'] = backend() if backend else None
+
+    @property
+    def backend(self):
+        return current_app.extensions.get('search_index')
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def index(self, research_ids):
+        """Adds or refreshes research in the index as part of the current transaction."""
+        research_ids = [research_id for research_id in research_ids if research_id is not None]
+        if self.backend is not None and research_ids:
+            db.session.flush()
+            documents = research_documents(research_ids)
+            if documents:
+                self.backend.index(documents)
+
+    def remove(self, research_ids):
+        research_ids = list(research_ids)
+        if self.backend is not None and research_ids:
+            self.backend.remove(research_ids)
+
+    def search(self, user_id, query, page=1, per_page=20):
+        """
+        Returns one page of the user's research matching the query, best match first.
+
+        Returns:
+            A tuple of (results, has_next) where results is a list of
+            (research, rank, snippet) tuples.
+        """
+        if self.backend is None or not query.strip():
+            return [], False
+        rows = self.backend.search(user_id, query, per_page + 1, (page - 1) * per_page)
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        researches = {research.id: research for research in Research.query.options(
+            load_only(Research.id, Research.status, Research.overall_score, Research.prompt_id,
+                      Research.project_id, Research.candidate_id, Research.research_model, Research.created_at),
+            joinedload(Research.candidate), joinedload(Research.project)
+        ).filter(Research.id.in_([research_id for research_id, rank, snippet in rows]))}
+        return [(researches[research_id], rank, highlight(snippet))
+                for research_id, rank, snippet in rows if research_id in researches], has_next
+
+
+search_index = SearchIndex()
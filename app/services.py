@@ -1,33 +1,127 @@
 import os
-from openai import OpenAI
+import json
+import atexit
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from openai import OpenAI, AsyncOpenAI
 import httpx
 from flask import current_app
 
-def get_profile_from_linkedin_url(linkedin_url: str, project_prompt: str, research_model: str): 
-    """
-    Gets a user's profile from a LinkedIn URL using the Perplexity API.
+# Clients are shared by every thread of a process (or every task of an event
+# loop) so that connections and TLS sessions to the API are reused.
+_clients = {}
+_clients_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
 
-    Args:
-        linkedin_url: The URL of the LinkedIn profile.
 
-    Returns:
-        A string containing the user's profile information.
-    """
+def _client_settings():
     api_key = current_app.config.get('PERPLEXITY_API_KEY')
     if not api_key:
         raise ValueError("PERPLEXITY_API_KEY not set in the application configuration.")
+    return api_key, current_app.config['PERPLEXITY_API_BASE']
 
-    # Explicitly create an httpx client to handle proxy settings correctly.
-    # This will respect HTTP_PROXY and HTTPS_PROXY environment variables.
-    # Set a longer timeout to accommodate potentially long-running research tasks
-    http_client = httpx.Client(timeout=120.0)
 
-    client = OpenAI(
-        api_key=api_key, 
-        base_url=current_app.config['PERPLEXITY_API_BASE'],
-        http_client=http_client
-    )
+def _http_client_options():
+    max_connections = current_app.config['PERPLEXITY_MAX_CONNECTIONS']
+    return {
+        # Set a longer timeout to accommodate potentially long-running research tasks
+        'timeout': current_app.config['PERPLEXITY_TIMEOUT'],
+        'limits': httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    }
+
+
+def get_perplexity_client():
+    """
+    Returns the OpenAI client for the Perplexity API shared by this process.
+
+    The client is created on first use. The process id is part of the cache key
+    so that a client created before a fork is never shared with the child.
+    """
+    api_key, base_url = _client_settings()
+    key = (os.getpid(), api_key, base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                # Explicitly create an httpx client to handle proxy settings correctly.
+                # This will respect HTTP_PROXY and HTTPS_PROXY environment variables.
+                http_client = httpx.Client(**_http_client_options())
+                # Retries are scheduled by the research worker (see app/ratelimit.py)
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+                _clients[key] = client
+    return client
+
+
+def get_async_perplexity_client():
+    """
+    Returns the AsyncOpenAI client for the Perplexity API bound to the running event loop.
+
+    httpx connection pools cannot be shared between event loops, so one client
+    is kept per loop.
+    """
+    api_key, base_url = _client_settings()
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get((api_key, base_url))
+    if client is None:
+        http_client = httpx.AsyncClient(**_http_client_options())
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        clients[(api_key, base_url)] = client
+    return client
+
+
+def close_perplexity_clients():
+    """Closes the clients created by this process."""
+    with _clients_lock:
+        for key in [key for key in _clients if key[0] == os.getpid()]:
+            _clients.pop(key).close()
 
+
+# Closes the connection pools of any clients still open when the process exits
+atexit.register(close_perplexity_clients)
+
+
+async def aclose_perplexity_clients():
+    """Closes the async clients bound to the running event loop."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+
+# The research model setting that screens candidates with a fast model first and
+# escalates the shortlist to deep research (see app/worker.py)
+ROUTED_RESEARCH_MODEL = 'routed'
+
+
+def should_escalate(score, threshold, elapsed=0.0, budget=None, estimate=None):
+    """
+    Decides whether a screened candidate gets a deep research pass.
+
+    Args:
+        score: The overall score of the screening pass.
+        threshold: The score from which candidates are always escalated.
+        elapsed: Seconds since the candidate was submitted.
+        budget: The project's latency budget in seconds, if it has one.
+        estimate: The expected duration of a deep research call in seconds.
+
+    Returns:
+        True for candidates scoring at least the threshold, and for the others
+        only when the deep pass is expected to finish within the budget.
+    """
+    try:
+        score = int(score)
+    except (TypeError, ValueError):
+        return False
+    if score >= threshold:
+        return True
+    return budget is not None and elapsed + estimate <= budget
+
+
+def _build_messages(linkedin_url: str, project_prompt: str):
     messages = [
         {
             "role": "system",
@@ -46,13 +140,176 @@ def get_profile_from_linkedin_url(linkedin_url: str, project_prompt: str, resear
         },
     ]
 
-    import json
-    current_app.logger.info("--- PROMPT SENT TO PERPLEXITY API ---")
-    current_app.logger.info(json.dumps(messages, indent=2))
+    # Prompts are large and repetitive, so only a sample is logged and only when debugging
+    logger = current_app.logger
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < current_app.config['PROMPT_LOG_SAMPLE_RATE']:
+        logger.debug("--- PROMPT SENT TO PERPLEXITY API ---")
+        logger.debug(json.dumps(messages, indent=2))
+    return messages
 
+
+class ResearchReportParser:
+    """
+    Incrementally extracts the JSON report from a (possibly streamed) completion.
+
+    The object may be wrapped in a ```json code fence or preceded by a
+    <think>...</think> section, so the parser skips to the first '{' outside
+    of a think block and tracks string and brace state to find where the
+    object ends. Text already scanned is never scanned again.
+    """
+
+    def __init__(self):
+        # Chunks are joined only when the full text is read, and only the part
+        # not scanned yet is kept as a string, so feeding stays linear
+        self._chunks = []
+        self._unscanned = ''
+        self._pos = 0
+        self._in_think = False
+        self._start = None
+        self._end = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def complete(self):
+        return self._end is not None
+
+    @property
+    def text(self):
+        """The text received so far."""
+        if len(self._chunks) > 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0] if self._chunks else ''
+
+    def feed(self, chunk):
+        self._chunks.append(chunk)
+        if self._end is None:
+            self._unscanned += chunk
+            self._scan()
+        return self
+
+    def _scan(self):
+        # Indexes into `text` are relative to self._pos; _start and _end are absolute
+        text = self._unscanned
+        base = self._pos
+        i = 0
+        while i < len(text) and self._end is None:
+            if self._start is None:
+                if self._in_think:
+                    close = text.find('</think>', i)
+                    if close == -1:
+                        # Keep the tail in case it holds the start of the closing tag
+                        i = max(i, len(text) - len('</think>') + 1)
+                        break
+                    self._in_think = False
+                    i = close + len('</think>')
+                elif text[i] == '<' and '<think>'.startswith(text[i:i + len('<think>')]):
+                    if len(text) - i < len('<think>'):
+                        break
+                    self._in_think = True
+                    i += len('<think>')
+                else:
+                    if text[i] == '{':
+                        self._start = base + i
+                        self._depth = 1
+                    i += 1
+                continue
+
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = base + i + 1
+            i += 1
+        self._unscanned = text[i:] if self._end is None else ''
+        self._pos = base + i
+
+    def result(self):
+        """Returns the decoded report, raising json.JSONDecodeError if it is missing or incomplete."""
+        if not self.complete:
+            raise json.JSONDecodeError("No complete JSON object in response", self.text, len(self.text))
+        return json.loads(self.text[self._start:self._end])
+
+
+def get_profile_from_linkedin_url(linkedin_url: str, project_prompt: str, research_model: str):
+    """
+    Gets a user's profile from a LinkedIn URL using the Perplexity API.
+
+    Args:
+        linkedin_url: The URL of the LinkedIn profile.
+
+    Returns:
+        A string containing the user's profile information.
+    """
+    client = get_perplexity_client()
     response = client.chat.completions.create(
         model=research_model,
-        messages=messages,
+        messages=_build_messages(linkedin_url, project_prompt),
+        stream=False
+    )
+    return response.choices[0].message.content
+
+
+async def aget_profile_from_linkedin_url(linkedin_url: str, project_prompt: str, research_model: str):
+    """
+    Async variant of `get_profile_from_linkedin_url`.
+
+    Many calls can be awaited concurrently on one event loop; they share the
+    loop's pooled connections instead of each holding an OS thread.
+    """
+    client = get_async_perplexity_client()
+    response = await client.chat.completions.create(
+        model=research_model,
+        messages=_build_messages(linkedin_url, project_prompt),
         stream=False
     )
     return response.choices[0].message.content
+
+
+def stream_profile_from_linkedin_url(linkedin_url: str, project_prompt: str, research_model: str):
+    """
+    Streaming variant of `get_profile_from_linkedin_url`.
+
+    Yields:
+        The pieces of the response content as they are generated.
+    """
+    client = get_perplexity_client()
+    stream = client.chat.completions.create(
+        model=research_model,
+        messages=_build_messages(linkedin_url, project_prompt),
+        stream=True
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+async def astream_profile_from_linkedin_url(linkedin_url: str, project_prompt: str, research_model: str):
+    """Async variant of `stream_profile_from_linkedin_url`."""
+    client = get_async_perplexity_client()
+    stream = await client.chat.completions.create(
+        model=research_model,
+        messages=_build_messages(linkedin_url, project_prompt),
+        stream=True
+    )
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await stream.close()
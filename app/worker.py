@@ -0,0 +1,793 @@
+import os
+import json
+import asyncio
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, insert, update, or_, exists, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import Research, ResearchReport, Candidate, Project, Prompt, project_candidates
+from app.cache import research_cache, research_cache_key
+from app.ratelimit import rate_limiter, is_retryable, retry_after, retry_delay
+from app.metrics import track_api_call, observe_status_duration
+from app.search import search_index
+from app.services import (
+    ROUTED_RESEARCH_MODEL, should_escalate, ResearchReportParser, get_profile_from_linkedin_url, aget_profile_from_linkedin_url,
+    stream_profile_from_linkedin_url, astream_profile_from_linkedin_url, close_perplexity_clients, aclose_perplexity_clients
+)
+
+
+class ResearchExecutor:
+    """
+    A fixed-size pool of threads that runs queued research jobs.
+
+    The queue lives in the database: a job is a `Research` row in the 'Pending'
+    state. A worker claims a job by moving it to 'In Progress' with a conditional
+    UPDATE, so every gunicorn worker process can poll the same queue without two
+    of them running the same job.
+
+    In 'threads' mode each of the RESEARCH_WORKERS threads runs one job at a
+    time. In 'asyncio' mode a single thread runs an event loop that keeps up to
+    RESEARCH_ASYNC_CONCURRENCY API calls in flight.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.worker_id = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['research_executor'] = self
+        # Threads are started lazily on the first request so that CLI commands
+        # such as `flask db upgrade` never start polling the database.
+        app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if not self._threads or not all(thread.is_alive() for thread in self._threads):
+            self.start(current_app._get_current_object())
+
+    def start(self, app):
+        """Starts the worker threads, or replaces those that have exited."""
+        with self._lock:
+            if app.config['RESEARCH_WORKERS'] <= 0:
+                return
+            alive = [thread for thread in self._threads if thread.is_alive()]
+            if self._threads and len(alive) == len(self._threads):
+                return
+            if self._threads:
+                app.logger.error(f"Replacing {len(self._threads) - len(alive)} research worker threads that exited.")
+            else:
+                self.app = app
+                self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+                self._stopping.clear()
+                with app.app_context():
+                    self.recover_orphans()
+            if app.config['RESEARCH_EXECUTOR_MODE'] == 'asyncio':
+                targets = {'research-worker-0': self._run_event_loop}
+            else:
+                targets = {f"research-worker-{i}": self._run for i in range(app.config['RESEARCH_WORKERS'])}
+            targets['research-heartbeat'] = self._run_heartbeat
+            running = {thread.name for thread in alive}
+            self._threads = alive
+            for name, target in targets.items():
+                if name not in running:
+                    thread = threading.Thread(target=target, name=name, daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            if not running:
+                app.logger.info(f"Started {len(self._threads) - 1} research workers in {app.config['RESEARCH_EXECUTOR_MODE']} mode ({self.worker_id})")
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        close_perplexity_clients()
+
+    def notify(self):
+        """Wakes idle workers so newly queued jobs are picked up immediately."""
+        self._wakeup.set()
+
+    def queue_depth(self):
+        return Research.query.filter_by(status='Pending').count()
+
+    def free_capacity(self):
+        """Returns how many more jobs may be queued before the queue is full."""
+        return max(0, current_app.config['RESEARCH_QUEUE_MAX'] - self.queue_depth())
+
+    def has_capacity(self, count=1):
+        return count <= self.free_capacity()
+
+    def renew_leases(self):
+        """Renews the lease of the jobs this process is running."""
+        db.session.execute(
+            update(Research)
+            .where(Research.claimed_by == self.worker_id, Research.status == 'In Progress')
+            # Setting updated_at to itself keeps a renewal from looking like a change to the page
+            .values(heartbeat_at=datetime.utcnow(), updated_at=Research.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def dead_workers(self):
+        """Returns the worker ids of processes on this host that hold jobs but no longer exist."""
+        host = socket.gethostname()
+        claimed_by = db.session.execute(
+            select(Research.claimed_by)
+            .where(Research.status == 'In Progress', Research.claimed_by.like(f"{host}:%"))
+            .distinct()
+        ).scalars()
+        dead = []
+        for worker_id in claimed_by:
+            try:
+                pid = int(worker_id.rsplit(':', 1)[1])
+            except ValueError:
+                continue
+            if worker_id != self.worker_id and not _process_exists(pid):
+                dead.append(worker_id)
+        return dead
+
+    def recover_orphans(self):
+        """
+        Puts back in the queue the 'In Progress' jobs whose process has died.
+
+        These are left behind when a process dies mid-research (e.g. a gunicorn
+        worker restart). A job is orphaned when its lease has not been renewed
+        for RESEARCH_JOB_LEASE_SECONDS, or at once when it was claimed by a
+        process on this host that no longer exists.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['RESEARCH_JOB_LEASE_SECONDS'])
+        lease = func.coalesce(Research.heartbeat_at, Research.claimed_at)
+        orphaned = (Research.status == 'In Progress',
+                    or_(lease.is_(None), lease < cutoff, Research.claimed_by.in_(self.dead_workers())))
+        project_ids = db.session.execute(select(Research.project_id).where(*orphaned).distinct()).scalars().all()
+        if not project_ids:
+            db.session.commit()
+            return 0
+        result = db.session.execute(
+            update(Research)
+            .where(*orphaned)
+            .values(status='Pending', claimed_by=None, claimed_at=None, heartbeat_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        Project.recount(project_ids)
+        db.session.commit()
+        if result.rowcount:
+            current_app.logger.warning(f"Re-queued {result.rowcount} orphaned research jobs.")
+        return result.rowcount
+
+    def claim_next(self):
+        """
+        Claims the oldest pending job that is due and returns its id, or None if there is none.
+
+        Jobs of projects with RESEARCH_PROJECT_CONCURRENCY jobs in progress wait
+        for one of them to finish.
+        Jobs with the same request key as a job already in progress are skipped:
+        they are completed with its result (see `complete_research`). The unique
+        index on in-flight request keys makes this hold across processes.
+        """
+        now = datetime.utcnow()
+        in_flight = aliased(Research)
+        criteria = [
+            Research.status == 'Pending',
+            or_(Research.next_attempt_at.is_(None), Research.next_attempt_at <= now),
+            ~exists().where(in_flight.request_key == Research.request_key, in_flight.status == 'In Progress'),
+        ]
+        project_concurrency = current_app.config['RESEARCH_PROJECT_CONCURRENCY']
+        if project_concurrency > 0:
+            # A large batch, such as a re-score, must not hold every worker
+            criteria.append(or_(Research.project_id.is_(None), Research.project_id.in_(
+                select(Project.id).where(Project.in_progress_count < project_concurrency))))
+        pending = db.session.execute(
+            select(Research.id, Research.project_id, Research.updated_at)
+            .where(*criteria)
+            .order_by(Research.id)
+            .limit(10)
+        ).all()
+        for research_id, project_id, pending_since in pending:
+            if project_concurrency > 0 and project_id is not None:
+                # Moves the job between the counters only while the project is under its limit;
+                # the row lock taken by the UPDATE makes the check hold between workers.
+                reserved = db.session.execute(
+                    update(Project)
+                    .where(Project.id == project_id, Project.in_progress_count < project_concurrency)
+                    .values(pending_count=Project.pending_count - 1, in_progress_count=Project.in_progress_count + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                if reserved.rowcount == 0:
+                    db.session.rollback()
+                    continue
+            else:
+                Project.count_status_change(project_id, 'Pending', 'In Progress')
+            try:
+                result = db.session.execute(
+                    update(Research)
+                    .where(Research.id == research_id, Research.status == 'Pending')
+                    .values(status='In Progress', claimed_by=self.worker_id, claimed_at=now, heartbeat_at=now,
+                            attempts=Research.attempts + 1)
+                    .execution_options(synchronize_session=False)
+                )
+            except IntegrityError:
+                # Another worker just started the same research; this one waits for its result
+                db.session.rollback()
+                continue
+            if result.rowcount == 1:
+                db.session.commit()
+                observe_status_duration('Pending', pending_since)
+                return research_id
+            # Claimed by another worker in the meantime
+            db.session.rollback()
+        return None
+
+    def _claim(self):
+        with self.app.app_context():
+            try:
+                return self.claim_next()
+            except Exception as e:
+                self.app.logger.error(f"Failed to claim a research job: {e}", exc_info=True)
+                db.session.rollback()
+                return None
+
+    def _release(self, research_id, error):
+        """
+        Puts back a job whose processing raised, so that it does not stay 'In Progress'.
+
+        The job is retried after a backoff, or failed once it has used all its
+        attempts. This runs in a new session, as the one that raised may be
+        unusable.
+        """
+        app = self.app
+        app.logger.error(f"[Research-{research_id}] Research job raised an error: {error!r}", exc_info=error)
+        with app.app_context():
+            try:
+                research = db.session.get(Research, research_id)
+                if research is None or research.status != 'In Progress' or research.claimed_by != self.worker_id:
+                    return
+                if research.attempts < app.config['RESEARCH_MAX_ATTEMPTS']:
+                    delay = retry_delay(error, research.attempts, app.config['RESEARCH_RETRY_BASE_DELAY'],
+                                        app.config['RESEARCH_RETRY_MAX_DELAY'])
+                    research.status = 'Pending'
+                    research.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                    research.claimed_by = None
+                    research.claimed_at = None
+                else:
+                    research.status = 'Failed'
+                    research.summary = f"An error occurred during research: {error}"
+                Project.count_status_change(research.project_id, 'In Progress', research.status)
+                db.session.commit()
+                app.logger.warning(f"[Research-{research_id}] Moved to '{research.status}' after the error.")
+            except Exception as e:
+                # The job is re-queued by recover_orphans once its lease expires
+                db.session.rollback()
+                app.logger.error(f"[Research-{research_id}] Failed to release research job: {e}", exc_info=True)
+
+    def _run_heartbeat(self):
+        while not self._stopping.wait(self.app.config['RESEARCH_HEARTBEAT_INTERVAL']):
+            with self.app.app_context():
+                try:
+                    self.renew_leases()
+                    if self.recover_orphans():
+                        self.notify()
+                except Exception as e:
+                    self.app.logger.error(f"Research heartbeat failed: {e}", exc_info=True)
+                    db.session.rollback()
+
+    def _wait_for_work(self):
+        self._wakeup.wait(self.app.config['RESEARCH_POLL_INTERVAL'])
+        self._wakeup.clear()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            research_id = self._claim()
+            if research_id is None:
+                self._wait_for_work()
+                continue
+            try:
+                background_research(self.app, research_id, self.worker_id)
+            except Exception as e:
+                self._release(research_id, e)
+
+    def _run_event_loop(self):
+        asyncio.run(self._run_async())
+
+    async def _run_async(self):
+        semaphore = asyncio.Semaphore(self.app.config['RESEARCH_ASYNC_CONCURRENCY'])
+        tasks = set()
+
+        async def run_job(research_id):
+            try:
+                await abackground_research(self.app, research_id, self.worker_id)
+            except Exception as e:
+                await asyncio.to_thread(self._release, research_id, e)
+            finally:
+                semaphore.release()
+
+        try:
+            while not self._stopping.is_set():
+                await semaphore.acquire()
+                research_id = await asyncio.to_thread(self._claim)
+                if research_id is None:
+                    semaphore.release()
+                    await asyncio.to_thread(self._wait_for_work)
+                    continue
+                task = asyncio.create_task(run_job(research_id))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            await aclose_perplexity_clients()
+
+
+research_executor = ResearchExecutor()
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Owned by another user, but it exists
+        pass
+    return True
+
+
+def insert_ignoring_conflicts(table):
+    """Returns an INSERT into the table that skips rows violating a unique constraint."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+def enqueue_research(project, user, linkedin_urls):
+    """
+    Queues research for many candidates of a project in a single transaction.
+
+    Existing candidates are resolved with one IN query, and the new `Candidate`,
+    `project_candidates` and `Research` rows are written with batched INSERTs.
+    Candidates whose result is in the research cache are completed immediately.
+
+    With the 'routed' research model each candidate is first queued for a
+    screening pass with RESEARCH_SCREENING_MODEL; see `escalate_research`.
+
+    Args:
+        project: The project the candidates are added to.
+        user: The user requesting the research.
+        linkedin_urls: The LinkedIn URLs of the candidates, duplicates allowed.
+
+    Returns:
+        The number of research rows created.
+    """
+    urls = list(dict.fromkeys(url.strip() for url in linkedin_urls if url.strip()))
+    if not urls:
+        return 0
+
+    candidate_ids = dict(db.session.execute(
+        select(Candidate.linkedin_url, Candidate.id).where(Candidate.linkedin_url.in_(urls))
+    ).all())
+    new_urls = [url for url in urls if url not in candidate_ids]
+    if new_urls:
+        # A concurrent submission may add the same candidates between the select and the insert
+        db.session.execute(insert_ignoring_conflicts(Candidate.__table__), [{'linkedin_url': url} for url in new_urls])
+        candidate_ids.update(db.session.execute(
+            select(Candidate.linkedin_url, Candidate.id).where(Candidate.linkedin_url.in_(new_urls))
+        ).all())
+    ids = [candidate_ids[url] for url in urls]
+
+    linked_ids = set(db.session.execute(
+        select(project_candidates.c.candidate_id)
+        .where(project_candidates.c.project_id == project.id, project_candidates.c.candidate_id.in_(ids))
+    ).scalars())
+    new_links = [{'project_id': project.id, 'candidate_id': cid} for cid in ids if cid not in linked_ids]
+    linked = 0
+    if new_links:
+        # Counts only the links this call made, not those a concurrent submission added
+        linked = len(db.session.execute(
+            insert_ignoring_conflicts(project_candidates).returning(project_candidates.c.candidate_id), new_links
+        ).all())
+
+    prompt = project.current_prompt
+    settings = user.settings
+    # Settings created on first access only get their column defaults once flushed
+    db.session.flush()
+    research_model, route = settings.research_model, None
+    if research_model == ROUTED_RESEARCH_MODEL:
+        research_model, route = current_app.config['RESEARCH_SCREENING_MODEL'], 'screening'
+
+    # Results already in the research cache are filled in without queueing a job.
+    # Screening passes still go through the worker, which decides on escalation
+    # and finds the cached result there.
+    cache_keys = {url: research_cache_key(url, prompt.text if prompt else "", research_model) for url in urls}
+    cached = research_cache.get_many(cache_keys.values()) if route is None else {}
+    rows = []
+    for url in urls:
+        row = {
+            'candidate_id': candidate_ids[url],
+            'project_id': project.id,
+            'user_id': user.id,
+            'prompt_id': prompt.id if prompt else None,
+            'research_model': research_model,
+            'route': route,
+            'request_key': cache_keys[url],
+            'status': 'Pending',
+        }
+        data = cached.get(cache_keys[url])
+        if data is not None:
+            row.update(status='Completed', summary=data.get('summary'), overall_score=data.get('overall_score'))
+        rows.append(row)
+    inserted = db.session.execute(
+        insert(Research).returning(Research.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    reports = [{'research_id': research_id, **ResearchReport.encode(cached[cache_keys[url]]['full_report'])}
+               for research_id, url in zip(inserted, urls)
+               if cache_keys[url] in cached and cached[cache_keys[url]].get('full_report') is not None]
+    if reports:
+        db.session.execute(insert(ResearchReport), reports)
+    search_index.index([research_id for research_id, url in zip(inserted, urls) if cache_keys[url] in cached])
+    completed = sum(1 for url in urls if cache_keys[url] in cached)
+    # A result without a name leaves the one the candidate already has
+    names = [{'id': candidate_ids[url], 'name': cached[cache_keys[url]]['candidate_name']}
+             for url in urls if cache_keys[url] in cached and cached[cache_keys[url]].get('candidate_name')]
+    if names:
+        db.session.execute(update(Candidate), names)
+    Project.adjust_counters(project.id, research_count=len(rows), candidate_count=linked,
+                            pending_count=len(rows) - completed, completed_count=completed)
+    db.session.commit()
+
+    if len(cached) < len(urls):
+        research_executor.notify()
+    return len(ids)
+
+
+def candidates_to_rescore(project):
+    """
+    Returns the candidates of a project that have no research against its current prompt.
+
+    Candidates with research against a prompt with the same text, completed or
+    still queued, are left out. Failed research does not count.
+
+    Returns:
+        A tuple of (linkedin_urls, skipped) where skipped is the number of
+        candidates left out.
+    """
+    prompt = project.current_prompt
+    linkedin_urls = db.session.execute(
+        select(Candidate.linkedin_url)
+        .join(project_candidates, project_candidates.c.candidate_id == Candidate.id)
+        .where(project_candidates.c.project_id == project.id)
+        .order_by(Candidate.id)
+    ).scalars().all()
+    scored = set(db.session.execute(
+        select(Candidate.linkedin_url)
+        .join(Research, Research.candidate_id == Candidate.id)
+        .join(Prompt, Research.prompt_id == Prompt.id)
+        .where(Research.project_id == project.id, Research.status != 'Failed',
+               Prompt.text == (prompt.text if prompt else ""))
+    ).scalars())
+    to_rescore = [url for url in linkedin_urls if url not in scored]
+    return to_rescore, len(linkedin_urls) - len(to_rescore)
+
+
+def prepare_research(app, research_id):
+    """Returns the API call arguments of a claimed research job, or None if it no longer exists."""
+    with app.app_context():
+        research = db.session.get(Research, research_id)
+        if not research:
+            app.logger.warning(f"[Research-{research_id}] Research with ID {research_id} not found.")
+            return None
+        research_model = research.research_model or research.user.settings.research_model
+        if research_model == ROUTED_RESEARCH_MODEL:
+            research_model = app.config['RESEARCH_SCREENING_MODEL']
+        return {
+            'linkedin_url': research.candidate.linkedin_url if research.candidate else "",
+            'project_prompt': research.prompt.text if research.prompt else "",
+            'research_model': research_model,
+        }
+
+
+def lookup_cached_result(app, job):
+    """Returns the cache key of a research job and its cached result, if any."""
+    with app.app_context():
+        cache_key = research_cache_key(**job)
+        return cache_key, research_cache.get(cache_key)
+
+
+def parse_research_result(research_id, parser):
+    """Returns the report decoded by a `ResearchReportParser`, logging the raw response if it is not valid JSON."""
+    current_app.logger.info(f"[Research-{research_id}] Parsing JSON response.")
+    try:
+        return parser.result()
+    except json.JSONDecodeError as e:
+        current_app.logger.error(f"[Research-{research_id}] Failed to decode JSON from API response: {e}")
+        current_app.logger.error(f"[Research-{research_id}] Raw response received: {parser.text}")
+        raise
+
+
+def save_partial_output(app, research_id, partial_output):
+    with app.app_context():
+        db.session.execute(
+            update(Research)
+            .where(Research.id == research_id)
+            .values(partial_output=partial_output)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+
+def call_research_api(app, research_id, job):
+    """
+    Runs the API call of a research job and returns the decoded report.
+
+    In streaming mode the response is consumed as it is generated, and the text
+    received so far is written to `Research.partial_output` at most every
+    RESEARCH_STREAM_FLUSH_INTERVAL seconds.
+    """
+    with app.app_context():
+        app.logger.info(f"[Research-{research_id}] Calling Perplexity API with model {job['research_model']} for {job['linkedin_url']}.")
+        parser = ResearchReportParser()
+        rate_limiter.acquire('perplexity')
+        with track_api_call(job['research_model']):
+            if not app.config['RESEARCH_STREAMING']:
+                parser.feed(get_profile_from_linkedin_url(**job))
+            else:
+                last_flush = time.monotonic()
+                try:
+                    for delta in stream_profile_from_linkedin_url(**job):
+                        parser.feed(delta)
+                        if time.monotonic() - last_flush >= app.config['RESEARCH_STREAM_FLUSH_INTERVAL']:
+                            save_partial_output(app, research_id, parser.text)
+                            last_flush = time.monotonic()
+                except Exception:
+                    # Keep what was received so far for the user to inspect
+                    save_partial_output(app, research_id, parser.text)
+                    raise
+        app.logger.info(f"[Research-{research_id}] Received response from Perplexity API.")
+        return parse_research_result(research_id, parser)
+
+
+async def acall_research_api(app, research_id, job):
+    """Async variant of `call_research_api`."""
+    with app.app_context():
+        app.logger.info(f"[Research-{research_id}] Calling Perplexity API with model {job['research_model']} for {job['linkedin_url']}.")
+        parser = ResearchReportParser()
+        await rate_limiter.aacquire('perplexity')
+        with track_api_call(job['research_model']):
+            if not app.config['RESEARCH_STREAMING']:
+                parser.feed(await aget_profile_from_linkedin_url(**job))
+            else:
+                last_flush = time.monotonic()
+                try:
+                    async for delta in astream_profile_from_linkedin_url(**job):
+                        parser.feed(delta)
+                        if time.monotonic() - last_flush >= app.config['RESEARCH_STREAM_FLUSH_INTERVAL']:
+                            await asyncio.to_thread(save_partial_output, app, research_id, parser.text)
+                            last_flush = time.monotonic()
+                except Exception:
+                    await asyncio.to_thread(save_partial_output, app, research_id, parser.text)
+                    raise
+        app.logger.info(f"[Research-{research_id}] Received response from Perplexity API.")
+        return parse_research_result(research_id, parser)
+
+
+def store_research_result(research, data):
+    """Fills in a research with a parsed result and marks it completed."""
+    # A result without a name leaves the one the candidate already has
+    if research.candidate and data.get('candidate_name'):
+        research.candidate.name = data['candidate_name']
+
+    research.summary = data.get('summary')
+    research.full_report = data.get('full_report')
+    research.overall_score = data.get('overall_score')
+    research.partial_output = None
+    research.status = 'Completed'
+
+
+def waiting_research(research):
+    """Returns the pending research with the same request key, locked for update."""
+    if not research.request_key:
+        return []
+    return (Research.query
+            .filter(Research.request_key == research.request_key, Research.id != research.id,
+                    Research.status == 'Pending')
+            .with_for_update()
+            .all())
+
+
+def estimate_deep_research_duration(sample_size=20):
+    """Returns the mean duration in seconds of the latest completed deep research calls."""
+    deep_model = current_app.config['RESEARCH_DEEP_MODEL']
+    rows = db.session.execute(
+        select(Research.claimed_at, Research.updated_at)
+        .where(Research.research_model == deep_model, Research.status == 'Completed',
+               Research.claimed_at.isnot(None))
+        .order_by(Research.id.desc())
+        .limit(sample_size)
+    ).all()
+    if not rows:
+        return current_app.config['RESEARCH_DEEP_ESTIMATE']
+    return sum((updated_at - claimed_at).total_seconds() for claimed_at, updated_at in rows) / len(rows)
+
+
+def escalate_research(research):
+    """
+    Queues a deep research pass for a completed screening pass that makes the shortlist.
+
+    The candidate is escalated when the screening score reaches the project's
+    escalation score, or when the deep pass is expected to finish within the
+    project's latency budget counted from the original submission. The new
+    `Research` is added to the current transaction.
+
+    Returns:
+        The deep research pass, or None if the candidate was not escalated.
+    """
+    project = research.project
+    threshold = project.escalation_score
+    if threshold is None:
+        threshold = current_app.config['RESEARCH_ESCALATION_SCORE']
+    estimate = estimate_deep_research_duration() if project.latency_budget is not None else None
+    elapsed = (datetime.utcnow() - research.created_at).total_seconds()
+    if not should_escalate(research.overall_score, threshold, elapsed, project.latency_budget, estimate):
+        return None
+
+    deep_model = current_app.config['RESEARCH_DEEP_MODEL']
+    deep = Research(
+        candidate_id=research.candidate_id,
+        project_id=research.project_id,
+        user_id=research.user_id,
+        prompt_id=research.prompt_id,
+        research_model=deep_model,
+        route='deep',
+        request_key=research_cache_key(research.candidate.linkedin_url if research.candidate else "",
+                                       research.prompt.text if research.prompt else "", deep_model),
+        parent=research,
+        status='Pending'
+    )
+    db.session.add(deep)
+    Project.adjust_counters(research.project_id, research_count=1, pending_count=1)
+    return deep
+
+
+def complete_research(app, research_id, worker_id, data=None, error=None, cache_key=None):
+    """
+    Stores the outcome of a research job.
+
+    A successful result is also stored on the pending research with the same
+    request key, which waited for this job instead of calling the API again.
+    The outcome is discarded if the worker no longer holds the job, e.g. when
+    its lease expired and the job was re-queued or claimed by another worker.
+
+    Args:
+        worker_id: The id of the executor that claimed the job.
+        data: The parsed research result, when the job succeeded.
+        error: The exception that made the job fail, otherwise.
+        cache_key: When given, the result is also stored in the research cache.
+    """
+    with app.app_context():
+        # Locked so that lease recovery cannot re-queue the job while it is completed
+        research = db.session.get(Research, research_id, with_for_update=True)
+        if not research:
+            app.logger.warning(f"[Research-{research_id}] Research with ID {research_id} not found.")
+            return
+        if research.status != 'In Progress' or research.claimed_by != worker_id:
+            app.logger.warning(f"[Research-{research_id}] Lost the job to {research.claimed_by or 'the queue'} "
+                               f"(now '{research.status}'), discarding this outcome.")
+            db.session.rollback()
+            return
+
+        observe_status_duration('In Progress', research.claimed_at)
+        followers = []
+        escalated = []
+        if error is None:
+            store_research_result(research, data)
+            app.logger.info(f"[Research-{research_id}] Research completed successfully.")
+            # Identical submissions that waited for this call get the same result; a
+            # worker that lost the job never gets here, so they are not completed twice
+            followers = waiting_research(research)
+            for follower in followers:
+                observe_status_duration('Pending', follower.updated_at)
+                Project.count_status_change(follower.project_id, follower.status, 'Completed')
+                store_research_result(follower, data)
+            search_index.index([research.id] + [follower.id for follower in followers])
+            for completed in [research] + followers:
+                if completed.route == 'screening':
+                    deep = escalate_research(completed)
+                    if deep is not None:
+                        escalated.append(deep)
+        elif is_retryable(error) and research.attempts < app.config['RESEARCH_MAX_ATTEMPTS']:
+            delay = retry_delay(error, research.attempts, app.config['RESEARCH_RETRY_BASE_DELAY'],
+                                app.config['RESEARCH_RETRY_MAX_DELAY'])
+            app.logger.warning(f"[Research-{research_id}] Attempt {research.attempts} failed with {error!r}, retrying in {delay:.0f}s.")
+            research.status = 'Pending'
+            research.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            research.claimed_by = None
+            research.claimed_at = None
+            # Waiting submissions must not retry the call before the backoff is over
+            for follower in waiting_research(research):
+                follower.next_attempt_at = research.next_attempt_at
+        else:
+            app.logger.error(f"[Research-{research_id}] An error occurred during research: {error}", exc_info=error)
+            research.status = 'Failed'
+            research.summary = f"An error occurred during research: {error}"
+
+        Project.count_status_change(research.project_id, 'In Progress', research.status)
+        db.session.commit()
+        app.logger.info(f"[Research-{research_id}] Final status '{research.status}' committed to database.")
+        if followers:
+            app.logger.info(f"[Research-{research_id}] Result shared with waiting research {', '.join(str(f.id) for f in followers)}.")
+        for deep in escalated:
+            app.logger.info(f"[Research-{deep.parent_id}] Screening score {deep.parent.overall_score}, escalated to deep research {deep.id}.")
+        if escalated:
+            research_executor.notify()
+
+        # Hold back every worker when the provider asked us to slow down
+        if error is not None and retry_after(error):
+            rate_limiter.pause('perplexity', retry_after(error))
+
+        if error is None and cache_key is not None:
+            try:
+                research_cache.set(cache_key, data)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"[Research-{research_id}] Failed to store result in the research cache: {e}")
+
+
+def background_research(app, research_id, worker_id):
+    """
+    Runs a claimed research job.
+
+    Each phase (prepare, cache lookup, API call, complete) runs in its own app
+    context and short transaction, so the job only holds a pooled database
+    connection while it reads or writes, never while it waits for the API.
+    """
+    job = prepare_research(app, research_id)
+    if job is None:
+        return
+
+    cache_key, data = lookup_cached_result(app, job)
+    if data is not None:
+        app.logger.info(f"[Research-{research_id}] Research cache hit.")
+        complete_research(app, research_id, worker_id, data)
+        return
+
+    try:
+        data = call_research_api(app, research_id, job)
+    except Exception as e:
+        complete_research(app, research_id, worker_id, error=e)
+        return
+    complete_research(app, research_id, worker_id, data, cache_key=cache_key)
+
+
+async def abackground_research(app, research_id, worker_id):
+    """Async variant of `background_research`; database work runs in the default thread pool."""
+    job = await asyncio.to_thread(prepare_research, app, research_id)
+    if job is None:
+        return
+
+    cache_key, data = await asyncio.to_thread(lookup_cached_result, app, job)
+    if data is not None:
+        app.logger.info(f"[Research-{research_id}] Research cache hit.")
+        await asyncio.to_thread(complete_research, app, research_id, worker_id, data)
+        return
+
+    try:
+        data = await acall_research_api(app, research_id, job)
+    except Exception as e:
+        await asyncio.to_thread(complete_research, app, research_id, worker_id, error=e)
+        return
+    await asyncio.to_thread(complete_research, app, research_id, worker_id, data, cache_key=cache_key)
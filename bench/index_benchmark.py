@@ -0,0 +1,116 @@
+"""
+Benchmark for the indexes on the hot query paths.
+
+Seeds a synthetic dataset into a throwaway SQLite database, then runs the
+queries behind the dashboard, the project page and the research worker
+without and with the indexes, printing the query plan and the median
+latency of each.
+
+Usage:
+    python bench/index_benchmark.py [--users 100] [--projects-per-user 20] [--research-per-project 100]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import Project, Prompt, Research, project_candidates
+from bench.seed import seed
+
+# Indexes added for these access patterns; dropped for the "before" run
+INDEXES = [
+    'ix_project_user_id_created_at',
+    'ix_project_candidates_candidate_id',
+    'ix_prompt_project_id_created_at',
+    'ix_research_candidate_id',
+    'ix_research_user_id',
+    'ix_research_project_id_overall_score',
+    'ix_research_project_id_updated_at',
+]
+def hot_queries(users, projects, candidates):
+    rng = random.Random(7)
+    recent = datetime.utcnow() - timedelta(days=1)
+    return {
+        'latest prompt': lambda: select(Prompt).where(Prompt.project_id == rng.randint(1, projects))
+            .order_by(Prompt.created_at.desc()).limit(1),
+        'dashboard projects': lambda: select(Project).where(Project.user_id == rng.randint(1, users))
+            .order_by(Project.created_at.desc()),
+        'project research page': lambda: select(Research.id, Research.overall_score)
+            .where(Research.project_id == rng.randint(1, projects))
+            .order_by(Research.overall_score.desc().nulls_first(), Research.id.desc()).limit(50),
+        'project event poll': lambda: select(Research.id)
+            .where(Research.project_id == rng.randint(1, projects), Research.updated_at > recent),
+        'research by candidate': lambda: select(Research.id).where(Research.candidate_id == rng.randint(1, candidates)),
+        'projects of candidate': lambda: select(project_candidates.c.project_id)
+            .where(project_candidates.c.candidate_id == rng.randint(1, candidates)),
+        'research by user': lambda: select(Research.id).where(Research.user_id == rng.randint(1, users)).limit(50),
+    }
+
+
+def run(queries, repeat):
+    results = {}
+    for name, build in queries.items():
+        statement = build()
+        compiled = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        plan = db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+        timings = []
+        for _ in range(repeat):
+            statement = build()
+            started = time.perf_counter()
+            db.session.execute(statement).all()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (' | '.join(row[-1] for row in plan), statistics.median(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--projects-per-user', type=int, default=20)
+    parser.add_argument('--research-per-project', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_file.name}', 'TESTING': True, 'RESEARCH_WORKERS': 0})
+    try:
+        with app.app_context():
+            db.create_all()
+            for name in INDEXES:
+                db.session.execute(text(f'DROP INDEX {name}'))
+            started = time.perf_counter()
+            projects, candidates = seed(args.users, args.projects_per_user, args.research_per_project)
+            print(f'Seeded {projects} projects and {projects * args.research_per_project} research rows '
+                  f'in {time.perf_counter() - started:.1f}s\n')
+            db.session.execute(text('ANALYZE'))
+            queries = hot_queries(args.users, projects, candidates)
+            before = run(queries, args.repeat)
+
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    if index.name in INDEXES:
+                        index.create(db.engine)
+            db.session.execute(text('ANALYZE'))
+            after = run(queries, args.repeat)
+    finally:
+        os.unlink(db_file.name)
+
+    for name in queries:
+        (plan_before, ms_before), (plan_after, ms_after) = before[name], after[name]
+        print(f'{name}: {ms_before:.3f} ms -> {ms_after:.3f} ms ({ms_before / max(ms_after, 1e-6):.1f}x)')
+        print(f'    before: {plan_before}')
+        print(f'    after:  {plan_after}')
+
+
+if __name__ == '__main__':
+    main()
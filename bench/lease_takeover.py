@@ -0,0 +1,109 @@
+"""
+Regression check for research outcomes that arrive after the job's lease was taken over.
+
+Seeds a throwaway SQLite database with a research job in progress and a
+waiting submission with the same request key. The job's lease then expires
+and another worker claims it. The stale worker's success, and then its
+error, must change neither the rows nor the project counters. The new
+claimant's result must complete both rows.
+
+Usage:
+    python bench/lease_takeover.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import User, Project, Prompt, Candidate, Research
+from app.worker import ResearchExecutor, complete_research
+
+RESULT = {'candidate_name': 'Jane Doe', 'overall_score': 80, 'summary': 'Summary', 'full_report': 'Report'}
+
+
+def seed():
+    """Returns the ids of a project, an in-progress job claimed by 'stale:1' and a submission waiting for it."""
+    user = User(username='lease', email='lease@example.com')
+    project = Project(name='Lease', creator=user)
+    prompt = Prompt(text='Senior Python engineer', project=project)
+    project.current_prompt = prompt
+    claimed_at = datetime.utcnow() - timedelta(hours=1)
+    jobs = []
+    for i, status in enumerate(['In Progress', 'Pending']):
+        candidate = Candidate(linkedin_url=f'https://www.linkedin.com/in/lease-{i}')
+        project.candidates.append(candidate)
+        jobs.append(Research(candidate=candidate, project=project, user=user, prompt=prompt, status=status,
+                             research_model='sonar-pro', request_key='same-request', attempts=1 if i == 0 else 0,
+                             claimed_by='stale:1' if i == 0 else None, claimed_at=claimed_at if i == 0 else None,
+                             heartbeat_at=claimed_at if i == 0 else None))
+    db.session.add_all([user, project, prompt, *jobs])
+    db.session.flush()
+    Project.recount([project.id])
+    db.session.commit()
+    return project.id, jobs[0].id, jobs[1].id
+
+
+def snapshot(project_id, *research_ids):
+    db.session.expire_all()
+    project = db.session.get(Project, project_id)
+    rows = [(r.status, r.claimed_by, r.overall_score) for r in (db.session.get(Research, i) for i in research_ids)]
+    counters = (project.pending_count, project.in_progress_count, project.completed_count, project.failed_count)
+    return rows, counters
+
+
+def main():
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_file.name}',
+        'TESTING': True,
+        'RESEARCH_WORKERS': 0,
+        'RESEARCH_CACHE_BACKEND': 'none',
+        'RESEARCH_PROJECT_CONCURRENCY': 0,
+    })
+
+    failures = []
+
+    def check(name, actual, expected):
+        status = 'ok' if actual == expected else 'FAIL'
+        print(f'{name:40} {status}')
+        if actual != expected:
+            failures.append(f'{name}: expected {expected}, got {actual}')
+
+    try:
+        with app.app_context():
+            db.create_all()
+            project_id, job_id, waiting_id = seed()
+
+            # The stale worker's lease has expired; another worker re-queues and claims the job
+            executor = ResearchExecutor()
+            executor.worker_id = 'fresh:2'
+            check('expired lease is recovered', executor.recover_orphans(), 1)
+            check('new worker claims the job', executor.claim_next(), job_id)
+            claimed = snapshot(project_id, job_id, waiting_id)
+
+        complete_research(app, job_id, 'stale:1', RESULT)
+        with app.app_context():
+            check('stale success changes nothing', snapshot(project_id, job_id, waiting_id), claimed)
+
+        complete_research(app, job_id, 'stale:1', error=TimeoutError('stale attempt timed out'))
+        with app.app_context():
+            check('stale error changes nothing', snapshot(project_id, job_id, waiting_id), claimed)
+
+        complete_research(app, job_id, 'fresh:2', RESULT)
+        with app.app_context():
+            check('new claimant completes both rows', snapshot(project_id, job_id, waiting_id),
+                  ([('Completed', 'fresh:2', 80), ('Completed', None, 80)], (0, 0, 2, 0)))
+    finally:
+        os.unlink(db_file.name)
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""
+Load test of the web app and the research pipeline against a local Perplexity stand-in.
+
+Seeds a throwaway database (see bench/seed.py), starts the mock API (see
+bench/mock_perplexity.py) and runs the app under gunicorn with the given
+number of workers and threads. Then it runs these scenarios:
+
+    render    concurrent GETs of project pages
+    submit    concurrent single-candidate submissions through project()
+    research  a bulk import drained by the background research workers
+
+Each scenario reports requests (or jobs) per second and p50/p95/p99 latency,
+plus the peak threads, open sockets and resident memory of the gunicorn
+processes, read from /proc while the scenario runs.
+
+Usage:
+    python bench/load_test.py [--scenarios render,submit,research] [--workers 2] [--threads 8]
+                              [--clients 16] [--requests 400] [--jobs 200] [--latency 2.0]
+                              [--error-rate 0.0] [--executor-mode threads] [--research-workers 4]
+
+Settings not covered by the options (e.g. RESEARCH_STREAMING) are passed to
+the app from the environment.
+"""
+import os
+import re
+import sys
+import time
+import uuid
+import random
+import signal
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from sqlalchemy import create_engine, select, func
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import Research, Candidate
+from bench.seed import seed, PASSWORD
+from bench import mock_perplexity
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSRF_PATTERN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def bench_app():
+    """The gunicorn entry point; unlike wsgi.py it honours a SQLite BENCH_DATABASE_URL."""
+    return create_app({'SQLALCHEMY_DATABASE_URI': os.environ['BENCH_DATABASE_URL']})
+
+
+def percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+class ProcessSampler:
+    """Samples the threads, sockets and memory of a process tree from /proc."""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak = {'threads': 0, 'sockets': 0, 'rss_mb': 0.0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _pids(self):
+        children = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat') as f:
+                        ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+                children.setdefault(ppid, []).append(int(entry))
+        pids, todo = [], [self.pid]
+        while todo:
+            pid = todo.pop()
+            pids.append(pid)
+            todo.extend(children.get(pid, []))
+        return pids
+
+    def sample(self):
+        totals = {'threads': 0, 'sockets': 0, 'rss_mb': 0.0}
+        for pid in self._pids():
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('Threads:'):
+                            totals['threads'] += int(line.split()[1])
+                        elif line.startswith('VmRSS:'):
+                            totals['rss_mb'] += int(line.split()[1]) / 1024
+                for fd in os.listdir(f'/proc/{pid}/fd'):
+                    if os.readlink(f'/proc/{pid}/fd/{fd}').startswith('socket:'):
+                        totals['sockets'] += 1
+            except OSError:
+                continue
+        return totals
+
+    def _run(self):
+        while not self._stop.is_set():
+            for name, value in self.sample().items():
+                self.peak[name] = max(self.peak[name], value)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = {'threads': 0, 'sockets': 0, 'rss_mb': 0.0}
+        if os.path.isdir('/proc'):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+    def describe(self):
+        if self._thread is None:
+            return 'process stats unavailable (no /proc)'
+        return (f"peak {self.peak['threads']} threads, {self.peak['sockets']} sockets, "
+                f"{self.peak['rss_mb']:.0f} MB RSS")
+
+
+class Client:
+    """A signed-in browser session."""
+
+    def __init__(self, base_url, username):
+        self.base_url = base_url
+        self.session = requests.Session()
+        response = self.session.get(f'{base_url}/login')
+        response = self.session.post(f'{base_url}/login', data={
+            'csrf_token': CSRF_PATTERN.search(response.text).group(1),
+            'username': username, 'password': PASSWORD,
+        }, allow_redirects=False)
+        if response.status_code != 302:
+            raise RuntimeError(f'Could not sign in as {username}: HTTP {response.status_code}')
+        self._csrf_token = None
+
+    def get(self, path):
+        return self.session.get(f'{self.base_url}{path}', allow_redirects=False)
+
+    def post_form(self, path, data):
+        if self._csrf_token is None:
+            self._csrf_token = CSRF_PATTERN.search(self.get(path).text).group(1)
+        return self.session.post(f'{self.base_url}{path}', data={'csrf_token': self._csrf_token, **data},
+                                 allow_redirects=False)
+
+
+def run_requests(clients, total, request):
+    """Sends `total` requests from the clients concurrently and returns (latencies, errors, seconds)."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    remaining = iter(range(total))
+
+    def worker(client):
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                response = request(client)
+                ok = response.status_code < 400
+            except requests.RequestException as e:
+                response, ok = e, False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors.append(getattr(response, 'status_code', repr(response)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(len(clients)) as pool:
+        list(pool.map(worker, clients))
+    return latencies, errors, time.perf_counter() - started
+
+
+def report(name, latencies, errors, seconds, sampler, unit='requests'):
+    p50, p95, p99 = percentiles(latencies)
+    print(f'{name:<9} {len(latencies)} {unit} in {seconds:.1f}s = {len(latencies) / seconds:.1f}/s, '
+          f'p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms, {len(errors)} errors')
+    if errors:
+        print(f'          errors: {dict((e, errors.count(e)) for e in set(errors))}')
+    print(f'          {sampler.describe()}')
+
+
+def scenario_render(args, clients, projects_of, sampler):
+    def request(client):
+        return client.get(f'/project/{random.choice(projects_of[client])}')
+
+    with sampler:
+        latencies, errors, seconds = run_requests(clients, args.requests, request)
+    report('render', latencies, errors, seconds, sampler)
+
+
+def scenario_submit(args, clients, projects_of, sampler):
+    def request(client):
+        return client.post_form(f'/project/{random.choice(projects_of[client])}', {
+            'linkedin_url': f'https://www.linkedin.com/in/submit-{uuid.uuid4().hex[:12]}',
+            'submit_research': 'Add Candidate and Perform Research',
+        })
+
+    with sampler:
+        latencies, errors, seconds = run_requests(clients, args.requests, request)
+    report('submit', latencies, errors, seconds, sampler)
+
+
+def scenario_research(args, clients, projects_of, sampler, engine):
+    client = clients[0]
+    prefix = f'https://www.linkedin.com/in/bulk-{uuid.uuid4().hex[:8]}-'
+    urls = '\n'.join(f'{prefix}{i}' for i in range(args.jobs))
+    query = (select(Research.status, Research.created_at, Research.updated_at)
+             .join(Candidate, Research.candidate_id == Candidate.id)
+             .where(Candidate.linkedin_url.like(f'{prefix}%')))
+
+    # Jobs queued by the submit scenario would otherwise count against this one
+    deadline = time.perf_counter() + args.timeout
+    while time.perf_counter() < deadline:
+        with engine.connect() as conn:
+            backlog = conn.execute(select(func.count()).select_from(Research)
+                                   .where(Research.status.in_(['Pending', 'In Progress']))).scalar()
+        if not backlog:
+            break
+        time.sleep(0.5)
+
+    with sampler:
+        started = time.perf_counter()
+        response = client.post_form(f'/project/{projects_of[client][0]}', {
+            'linkedin_urls': urls, 'submit_bulk': 'Import Candidates and Perform Research',
+        })
+        if response.status_code != 302:
+            print(f'research  bulk import failed: HTTP {response.status_code}')
+            return
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline:
+            with engine.connect() as conn:
+                open_jobs = conn.execute(
+                    select(func.count()).select_from(query.where(Research.status.in_(['Pending', 'In Progress']))
+                                                     .subquery())
+                ).scalar()
+            if open_jobs == 0:
+                break
+            time.sleep(0.5)
+        seconds = time.perf_counter() - started
+        with engine.connect() as conn:
+            rows = conn.execute(query).all()
+
+    done = [row for row in rows if row.status in ('Completed', 'Failed')]
+    latencies = [(row.updated_at - row.created_at).total_seconds() for row in done]
+    errors = [row.status for row in rows if row.status != 'Completed']
+    report('research', latencies, errors, seconds, sampler, unit='jobs')
+
+
+def wait_until_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            if requests.get(f'{base_url}/login', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default='render,submit,research')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker.')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent simulated users.')
+    parser.add_argument('--requests', type=int, default=400, help='Requests per HTTP scenario.')
+    parser.add_argument('--jobs', type=int, default=200, help='Candidates in the research scenario.')
+    parser.add_argument('--timeout', type=float, default=600, help='Seconds to wait for the research scenario.')
+    parser.add_argument('--executor-mode', default='threads', choices=['threads', 'asyncio'])
+    parser.add_argument('--research-workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=2.0, help='Mean seconds per mock API response.')
+    parser.add_argument('--jitter', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--projects-per-user', type=int, default=5)
+    parser.add_argument('--research-per-project', type=int, default=200)
+    parser.add_argument('--database-url', help='An empty database to use instead of a temporary SQLite file.')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--mock-port', type=int, default=8765)
+    args = parser.parse_args()
+
+    db_file = None
+    database_url = args.database_url
+    if not database_url:
+        db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        db_file.close()
+        database_url = f'sqlite:///{db_file.name}'
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'TESTING': True, 'RESEARCH_WORKERS': 0})
+    with app.app_context():
+        db.create_all()
+        projects, _ = seed(args.users, args.projects_per_user, args.research_per_project)
+    print(f'Seeded {projects} projects of {args.research_per_project} research rows into {database_url}')
+
+    mock = mock_perplexity.serve(args.mock_port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    env = dict(os.environ)
+    env.update(BENCH_DATABASE_URL=database_url, SECRET_KEY='bench', PERPLEXITY_API_KEY='bench',
+               PERPLEXITY_API_BASE=f'http://127.0.0.1:{args.mock_port}',
+               RESEARCH_EXECUTOR_MODE=args.executor_mode, RESEARCH_WORKERS=str(args.research_workers))
+    for name, value in {'RESEARCH_QUEUE_MAX': '100000', 'BULK_IMPORT_MAX': '100000',
+                        'PERPLEXITY_RATE_LIMIT': '100000', 'PERPLEXITY_RATE_BURST': '1000',
+                        'RESEARCH_CACHE_BACKEND': 'none', 'RESEARCH_POLL_INTERVAL': '1'}.items():
+        env.setdefault(name, value)
+    base_url = f'http://127.0.0.1:{args.port}'
+    server_log = tempfile.NamedTemporaryFile(prefix='talia-load-test-', suffix='.log', delete=False)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--threads', str(args.threads),
+         '--bind', f'127.0.0.1:{args.port}', '--log-level', 'warning', 'bench.load_test:bench_app()'],
+        cwd=ROOT, env=env, stdout=server_log, stderr=subprocess.STDOUT)
+    engine = create_engine(database_url)
+    try:
+        wait_until_ready(base_url, server)
+        print(f'gunicorn: {args.workers} workers x {args.threads} threads, research executor: '
+              f'{args.executor_mode} x {args.research_workers}, mock latency {args.latency}s, '
+              f'error rate {args.error_rate:.0%}, {args.clients} clients\n')
+        clients = [Client(base_url, f'user{i % args.users + 1}') for i in range(args.clients)]
+        projects_of = {}
+        for i, client in enumerate(clients):
+            user = i % args.users
+            projects_of[client] = list(range(user * args.projects_per_user + 1, (user + 1) * args.projects_per_user + 1))
+        sampler = ProcessSampler(server.pid)
+
+        for name in args.scenarios.split(','):
+            if name == 'render':
+                scenario_render(args, clients, projects_of, sampler)
+            elif name == 'submit':
+                scenario_submit(args, clients, projects_of, sampler)
+            elif name == 'research':
+                scenario_research(args, clients, projects_of, sampler, engine)
+            else:
+                parser.error(f'Unknown scenario {name}')
+        print(f'\nmock API: {mock.stats.as_dict()}')
+        print(f'app log: {server_log.name}')
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        mock.shutdown()
+        engine.dispose()
+        if db_file is not None:
+            os.unlink(db_file.name)
+
+
+if __name__ == '__main__':
+    main()
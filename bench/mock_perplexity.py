@@ -0,0 +1,180 @@
+"""
+A local stand-in for the Perplexity chat completions API.
+
+Answers POST /chat/completions like the OpenAI-compatible API, streamed or
+not, with a research report whose score is derived from the LinkedIn URL in
+the prompt. Latency, jitter and the share of 429 and 500 responses are
+configurable. GET /stats returns the request counts and the peak number of
+concurrent requests.
+
+Point the app at it with PERPLEXITY_API_BASE=http://127.0.0.1:<port>.
+
+Usage:
+    python bench/mock_perplexity.py [--port 8765] [--latency 2.0] [--jitter 0.5] [--error-rate 0.05] [--chunks 40]
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MockSettings:
+    def __init__(self, latency=2.0, jitter=0.5, error_rate=0.0, chunks=40):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.chunks = chunks
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses = Counter()
+        self.models = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def start(self, model):
+        with self.lock:
+            self.models[model] += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finish(self, status):
+        with self.lock:
+            self.in_flight -= 1
+            self.responses[status] += 1
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'requests': sum(self.responses.values()) + self.in_flight,
+                'responses': dict(self.responses),
+                'models': dict(self.models),
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+            }
+
+
+def research_report(prompt):
+    """Builds a deterministic report for the LinkedIn URL found in the prompt."""
+    match = re.search(r'https?://\S+', prompt)
+    url = match.group(0) if match else ''
+    digest = int(hashlib.sha256(url.encode('utf-8')).hexdigest(), 16)
+    return json.dumps({
+        'candidate_name': f'Candidate {digest % 100000}',
+        'overall_score': digest % 101,
+        'summary': f'A synthetic summary for {url}.',
+        'full_report': ' '.join(['Synthetic report text.'] * 200),
+    })
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    settings = MockSettings()
+    stats = MockStats()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send_json(200, self.stats.as_dict())
+        else:
+            self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        settings = self.settings
+        model = body.get('model', '')
+        self.stats.start(model)
+        status = 200
+        try:
+            delay = max(0.0, random.gauss(settings.latency, settings.jitter))
+            roll = random.random()
+            if roll < settings.error_rate:
+                time.sleep(delay / 10)
+                status = 429 if roll < settings.error_rate / 2 else 500
+                self._send_json(status, {'error': {'message': 'Simulated failure'}},
+                                headers={'Retry-After': '1'} if status == 429 else None)
+                return
+
+            messages = body.get('messages') or [{}]
+            content = '```json\n' + research_report(messages[-1].get('content', '')) + '\n```'
+            if not body.get('stream'):
+                time.sleep(delay)
+                self._send_json(200, {
+                    'id': 'mock', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                 'finish_reason': 'stop'}],
+                })
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            size = max(1, len(content) // settings.chunks)
+            pieces = [content[i:i + size] for i in range(0, len(content), size)]
+            for piece in pieces:
+                time.sleep(delay / len(pieces))
+                chunk = {'id': 'mock', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                         'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+                self._write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self._write_chunk(b'data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+        finally:
+            self.stats.finish(status)
+
+
+def serve(port=8765, **settings):
+    """Starts the server in a daemon thread and returns it; `server.stats` holds the counters."""
+    handler = type('Handler', (MockHandler,), {'settings': MockSettings(**settings), 'stats': MockStats()})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.stats = handler.stats
+    threading.Thread(target=server.serve_forever, name='mock-perplexity', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=2.0, help='Mean seconds per response.')
+    parser.add_argument('--jitter', type=float, default=0.5, help='Standard deviation of the latency.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of 429 and 500 responses.')
+    parser.add_argument('--chunks', type=int, default=40, help='Chunks per streamed response.')
+    args = parser.parse_args()
+
+    server = serve(args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, chunks=args.chunks)
+    print(f'Mock Perplexity API listening on http://127.0.0.1:{args.port}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
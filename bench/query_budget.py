@@ -0,0 +1,115 @@
+"""
+Query-count regression check for the main pages.
+
+Seeds a throwaway SQLite database with projects of different sizes, renders
+each page through the Flask test client and counts the SQL statements it
+issues. Fails if a page exceeds its budget, or if the count grows with the
+number of candidates (an N+1 query).
+
+Usage:
+    python bench/query_budget.py
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import User, Project, Prompt, Candidate, Research
+
+# Maximum number of SQL statements per page, independent of project size
+BUDGETS = {
+    'dashboard': 3,
+    'project': 4,
+    'research_detail': 3,
+}
+SMALL, LARGE = 5, 200
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed_project(user, name, size):
+    project = Project(name=name, creator=user)
+    prompt = Prompt(text='Senior Python engineer', project=project)
+    project.current_prompt = prompt
+    db.session.add_all([project, prompt])
+    for i in range(size):
+        candidate = Candidate(linkedin_url=f'https://www.linkedin.com/in/{name}-{i}', name=f'Candidate {i}')
+        project.candidates.append(candidate)
+        db.session.add(Research(candidate=candidate, project=project, user=user, prompt=prompt,
+                                status='Completed', overall_score=i % 100, summary='Summary', full_report='Report'))
+    db.session.flush()
+    Project.recount([project.id])
+    db.session.commit()
+    return project
+
+
+def main():
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_file.name}',
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'query-budget',
+        'RESEARCH_WORKERS': 0,
+    })
+
+    failures = []
+    try:
+        with app.app_context():
+            db.create_all()
+            user = User(username='budget', email='budget@example.com')
+            user.set_password('budget')
+            db.session.add(user)
+            small = seed_project(user, 'small', SMALL)
+            large = seed_project(user, 'large', LARGE)
+            pages = {
+                'dashboard': ['/dashboard'],
+                'project': [f'/project/{small.id}', f'/project/{large.id}'],
+                'research_detail': [f'/research/{large.researches.first().id}'],
+            }
+            engine = db.engine
+
+        client = app.test_client()
+        client.post('/login', data={'username': 'budget', 'password': 'budget'})
+
+        for page, urls in pages.items():
+            counts = []
+            for url in urls:
+                with count_queries(engine) as statements:
+                    response = client.get(url)
+                if response.status_code != 200:
+                    failures.append(f'{url} returned {response.status_code}')
+                counts.append(len(statements))
+                print(f'{page:16} {url:24} {len(statements):3} queries (budget {BUDGETS[page]})')
+            if max(counts) > BUDGETS[page]:
+                failures.append(f'{page} issued {max(counts)} queries, budget is {BUDGETS[page]}')
+            if len(set(counts)) > 1:
+                failures.append(f'{page} query count grows with project size: {counts}')
+    finally:
+        os.unlink(db_file.name)
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
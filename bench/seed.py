@@ -0,0 +1,116 @@
+"""
+Seeded synthetic dataset for the benchmarks.
+
+Creates users, projects with several prompt versions, candidates and research
+rows with realistic report sizes, and fills in the denormalized project
+counters and current prompts so that the app can serve the data. Every user
+can sign in as user<N> with the password 'password'.
+
+Usage:
+    python bench/seed.py --database-url sqlite:////tmp/talia-bench.db [--users 10] [--projects-per-user 5] [--research-per-project 200]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import User, Project, Prompt, Candidate, Research, ResearchReport, project_candidates
+
+STATUSES = ['Completed'] * 8 + ['Pending', 'Failed']
+PASSWORD = 'password'
+
+
+def seed(users, projects_per_user, research_per_project, prompts_per_project=5, report_size=2000):
+    """
+    Inserts the dataset into the database of the current app context.
+
+    Returns:
+        A tuple of (projects, candidates) with the number of rows created.
+    """
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=365)
+    password_hash = generate_password_hash(PASSWORD)
+    db.session.execute(insert(User), [
+        {'id': u, 'username': f'user{u}', 'email': f'user{u}@example.com', 'password_hash': password_hash}
+        for u in range(1, users + 1)
+    ])
+    project_ids = range(1, users * projects_per_user + 1)
+    candidates = len(project_ids) * research_per_project // 2
+    db.session.execute(insert(Candidate), [
+        {'id': c, 'linkedin_url': f'https://www.linkedin.com/in/candidate-{c}'} for c in range(1, candidates + 1)
+    ])
+
+    links, research = set(), []
+    report = ResearchReport.encode('Report ' * report_size)
+    counters = {p: dict.fromkeys(Project.STATUS_COUNTERS.values(), 0) for p in project_ids}
+    for p in project_ids:
+        user_id = (p - 1) // projects_per_user + 1
+        for _ in range(research_per_project):
+            candidate_id = rng.randint(1, candidates)
+            links.add((p, candidate_id))
+            status = rng.choice(STATUSES)
+            counters[p][Project.STATUS_COUNTERS[status]] += 1
+            research.append({
+                'project_id': p, 'candidate_id': candidate_id, 'user_id': user_id, 'status': status,
+                'prompt_id': p * prompts_per_project, 'research_model': 'sonar-pro',
+                'overall_score': rng.randint(0, 100) if status == 'Completed' else None,
+                'summary': 'Summary ' * 20,
+                'updated_at': start + timedelta(seconds=rng.randint(0, 365 * 86400)),
+            })
+    candidate_counts = {p: 0 for p in project_ids}
+    for p, _ in links:
+        candidate_counts[p] += 1
+
+    db.session.execute(insert(Project), [
+        {'id': p, 'name': f'Project {p}', 'user_id': (p - 1) // projects_per_user + 1,
+         'created_at': start + timedelta(minutes=p), 'research_count': research_per_project,
+         'candidate_count': candidate_counts[p], **counters[p]} for p in project_ids
+    ])
+    # Prompt ids are assigned so that the latest version of project p is p * prompts_per_project
+    db.session.execute(insert(Prompt), [
+        {'id': (p - 1) * prompts_per_project + v + 1, 'project_id': p, 'text': f'Prompt {v} for project {p}',
+         'created_at': start + timedelta(minutes=p, seconds=v)}
+        for p in project_ids for v in range(prompts_per_project)
+    ])
+    db.session.execute(update(Project), [
+        {'id': p, 'current_prompt_id': p * prompts_per_project} for p in project_ids
+    ])
+    db.session.execute(project_candidates.insert(), [{'project_id': p, 'candidate_id': c} for p, c in links])
+    for i in range(0, len(research), 10000):
+        research_ids = db.session.execute(
+            insert(Research).returning(Research.id, sort_by_parameter_order=True), research[i:i + 10000]
+        ).scalars()
+        db.session.execute(insert(ResearchReport), [{'research_id': research_id, **report} for research_id in research_ids])
+    db.session.commit()
+    return len(project_ids), candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True, help='An empty database; its tables are created.')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--projects-per-user', type=int, default=5)
+    parser.add_argument('--research-per-project', type=int, default=200)
+    parser.add_argument('--report-size', type=int, default=2000, help='Words per full report.')
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url, 'TESTING': True, 'RESEARCH_WORKERS': 0})
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        projects, candidates = seed(args.users, args.projects_per_user, args.research_per_project,
+                                    report_size=args.report_size)
+    print(f'Seeded {args.users} users, {projects} projects, {candidates} candidates and '
+          f'{projects * args.research_per_project} research rows in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -14,9 +14,92 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'instance/app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool of each process. Research workers only check out a
+    # connection to claim or save a job, never for the duration of an API call.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    # Seconds to wait for a free connection before failing the request
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    # Reconnect before RDS or a proxy drops idle connections
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    # SQLite only: write-ahead logging lets readers run alongside the writer, and
+    # writers wait this many seconds for the lock instead of failing at once
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', 'true').lower() in ('1', 'true', 'yes')
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 15))
 
     # Perplexity API configuration
-    PERPLEXITY_API_BASE = 'https://api.perplexity.ai'
+    # Point at a local stand-in (see bench/mock_perplexity.py) for load tests
+    PERPLEXITY_API_BASE = os.environ.get('PERPLEXITY_API_BASE', 'https://api.perplexity.ai')
+    PERPLEXITY_TIMEOUT = float(os.environ.get('PERPLEXITY_TIMEOUT', 120.0))
+    # Size of the per-process HTTP connection pool to the API
+    PERPLEXITY_MAX_CONNECTIONS = int(os.environ.get('PERPLEXITY_MAX_CONNECTIONS', 50))
+    # Requests per minute allowed by the provider, and how many may be sent at once
+    PERPLEXITY_RATE_LIMIT = float(os.environ.get('PERPLEXITY_RATE_LIMIT', 50))
+    PERPLEXITY_RATE_BURST = int(os.environ.get('PERPLEXITY_RATE_BURST', 5))
+    # 'memory' paces each process on its own, 'database' shares the limit between processes
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    # Retries of research calls that hit rate limits, server or network errors
+    RESEARCH_MAX_ATTEMPTS = int(os.environ.get('RESEARCH_MAX_ATTEMPTS', 5))
+    RESEARCH_RETRY_BASE_DELAY = float(os.environ.get('RESEARCH_RETRY_BASE_DELAY', 10))
+    RESEARCH_RETRY_MAX_DELAY = float(os.environ.get('RESEARCH_RETRY_MAX_DELAY', 600))
+
+    # Background research worker pool (per gunicorn worker process)
+    # 'threads' runs RESEARCH_WORKERS blocking workers, 'asyncio' runs one event
+    # loop with up to RESEARCH_ASYNC_CONCURRENCY API calls in flight.
+    RESEARCH_EXECUTOR_MODE = os.environ.get('RESEARCH_EXECUTOR_MODE', 'threads')
+    RESEARCH_WORKERS = int(os.environ.get('RESEARCH_WORKERS', 4))
+    RESEARCH_ASYNC_CONCURRENCY = int(os.environ.get('RESEARCH_ASYNC_CONCURRENCY', 32))
+    # Maximum number of 'Pending' research jobs before new submissions are refused
+    RESEARCH_QUEUE_MAX = int(os.environ.get('RESEARCH_QUEUE_MAX', 500))
+    # Maximum number of jobs of one project in progress at a time, 0 for no limit
+    RESEARCH_PROJECT_CONCURRENCY = int(os.environ.get('RESEARCH_PROJECT_CONCURRENCY', 8))
+    # Seconds an idle worker sleeps before polling the queue again
+    RESEARCH_POLL_INTERVAL = float(os.environ.get('RESEARCH_POLL_INTERVAL', 5))
+    # Each process renews the lease of its 'In Progress' jobs this often and
+    # re-queues jobs whose lease has not been renewed for RESEARCH_JOB_LEASE_SECONDS
+    RESEARCH_HEARTBEAT_INTERVAL = float(os.environ.get('RESEARCH_HEARTBEAT_INTERVAL', 30))
+    RESEARCH_JOB_LEASE_SECONDS = int(os.environ.get('RESEARCH_JOB_LEASE_SECONDS', 120))
+    # Stream research responses and save the partial output every few seconds
+    RESEARCH_STREAMING = os.environ.get('RESEARCH_STREAMING', 'true').lower() in ('1', 'true', 'yes')
+    RESEARCH_STREAM_FLUSH_INTERVAL = float(os.environ.get('RESEARCH_STREAM_FLUSH_INTERVAL', 3))
+    # The 'routed' research model screens every candidate with the fast model and
+    # runs deep research only for candidates scoring at least RESEARCH_ESCALATION_SCORE,
+    # or for any candidate when the project's latency budget leaves room for it
+    RESEARCH_SCREENING_MODEL = os.environ.get('RESEARCH_SCREENING_MODEL', 'sonar-pro')
+    RESEARCH_DEEP_MODEL = os.environ.get('RESEARCH_DEEP_MODEL', 'sonar-deep-research')
+    RESEARCH_ESCALATION_SCORE = int(os.environ.get('RESEARCH_ESCALATION_SCORE', 70))
+    # Expected seconds per deep research call until enough have completed to measure it
+    RESEARCH_DEEP_ESTIMATE = float(os.environ.get('RESEARCH_DEEP_ESTIMATE', 300))
+    # Research result cache: 'memory' (per process), 'database' (shared) or 'none'
+    RESEARCH_CACHE_BACKEND = os.environ.get('RESEARCH_CACHE_BACKEND', 'memory')
+    RESEARCH_CACHE_TTL = int(os.environ.get('RESEARCH_CACHE_TTL', 7 * 24 * 3600))
+    RESEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('RESEARCH_CACHE_MAX_ENTRIES', 10000))
+    # Rendered HTML of completed research cards, cached in each process
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 3600))
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+    # Compression of stored research reports: 'zlib' or 'none'. Existing
+    # reports keep the compression they were written with.
+    REPORT_COMPRESSION = os.environ.get('REPORT_COMPRESSION', 'zlib')
+    # Number of research cards per page on the project page
+    RESEARCH_PAGE_SIZE = int(os.environ.get('RESEARCH_PAGE_SIZE', 50))
+    # Rows fetched per round trip when streaming a project export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+    # Number of results per page of the research search
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    # Server-Sent Events for research progress. Each open stream holds a web
+    # worker, so streams are closed after SSE_MAX_DURATION and the browser reconnects.
+    SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 2))
+    SSE_MAX_DURATION = int(os.environ.get('SSE_MAX_DURATION', 300))
+    # Maximum number of candidates accepted by a single bulk import
+    BULK_IMPORT_MAX = int(os.environ.get('BULK_IMPORT_MAX', 1000))
+
+    # Size of each rotated log file in logs/
+    LOG_FILE_MAX_BYTES = int(os.environ.get('LOG_FILE_MAX_BYTES', 10 * 1024 * 1024))
+    # Fraction of research prompts written to the log, at DEBUG level only
+    PROMPT_LOG_SAMPLE_RATE = float(os.environ.get('PROMPT_LOG_SAMPLE_RATE', 0.01))
+    # Bearer token required to scrape /metrics; while unset, /metrics answers 404
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 
     # Other LLM settings (if needed)
     LLM_API_KEY = os.environ.get('LLM_API_KEY')
@@ -0,0 +1,48 @@
+"""research full text search
+
+Revision ID: e19f4b56939c
+Revises: da45f262fafc
+Create Date: 2026-10-18 21:27:02.532748
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e19f4b56939c'
+down_revision = 'da45f262fafc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The search tables are kept out of the models (see app/search.py), so they
+    # are created here for each dialect and filled from the completed research
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(
+            'CREATE TABLE research_search ('
+            ' research_id INTEGER PRIMARY KEY REFERENCES research (id) ON DELETE CASCADE,'
+            ' document TSVECTOR NOT NULL)'
+        )
+        op.execute(
+            "INSERT INTO research_search (research_id, document) "
+            "SELECT id, setweight(to_tsvector('english', coalesce(summary, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(full_report, '')), 'B') "
+            "FROM research WHERE status = 'Completed'"
+        )
+        op.execute('CREATE INDEX ix_research_search_document ON research_search USING GIN (document)')
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE research_fts USING fts5(summary, full_report, tokenize='porter unicode61')")
+        op.execute(
+            "INSERT INTO research_fts (rowid, summary, full_report) "
+            "SELECT id, coalesce(summary, ''), coalesce(full_report, '') FROM research WHERE status = 'Completed'"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP TABLE research_search')
+    elif dialect == 'sqlite':
+        op.execute('DROP TABLE research_fts')